@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+'''
+Python heap retained per parsed item (tracemalloc) for each parser on synthetic inputs
+
+See README.md for licensing information and credits
+
+'''
+import gc
+import os
+import tracemalloc
+
+from bench_utils import (argument_parser, generated, nessus_report, nmap_scan, openvas_report, sparta_project,
+                         use_parsers, workdir)
+
+
+def parse_nessus(path):
+    import nessus_parser
+    parser = nessus_parser.NessusParser(path)
+    return parser, sum(len(host.report_items) for report in parser.reports for host in report.hosts)
+
+def parse_nmap(path):
+    import nmap_parser
+    parser = nmap_parser.NmapParser(path)
+    parser.parse()
+    return parser, sum(len(host.ports) for report in parser.reports for host in report.hosts)
+
+def parse_openvas(path):
+    import openvas_parser
+    parser = openvas_parser.OpenvasParser(path)
+    return parser, sum(len(host.report_items) for report in parser.reports for host in report.hosts)
+
+def parse_sparta(path):
+    import sparta_parser
+    parser = sparta_parser.SpartaParser(path)
+    return parser, sum(len(host.ports) for host in parser.hosts)
+
+# parser: (input file name, generator and its arguments, parse function, unit)
+INPUTS = {'nessus': ('memory.nessus', nessus_report, (1000, 100), parse_nessus, 'item'),
+          'nmap': ('memory_nmap.xml', nmap_scan, (20000, 8), parse_nmap, 'port'),
+          'openvas': ('memory_openvas.xml', openvas_report, (500, 50000), parse_openvas, 'result'),
+          'sparta': ('memory.sprt', sparta_project, (2000, 5), parse_sparta, 'port')}
+
+
+def main():
+    parser = argument_parser('Bytes of Python heap retained per item after a full parse, for each parser')
+    parser.add_argument('parsers', nargs='*',
+                        help='Parsers to measure: %s (default all)' % ', '.join(sorted(INPUTS))
+    )
+    args = parser.parse_args()
+    for name in args.parsers:
+        if name not in INPUTS:
+            parser.error('unknown parser %r' % name)
+
+    use_parsers(args.src)
+    with workdir(args.workdir) as directory:
+        for name in args.parsers or sorted(INPUTS):
+            filename, generator, generator_args, parse, unit = INPUTS[name]
+            path = generated(os.path.join(directory, filename), generator, *generator_args)
+
+            gc.collect()
+            tracemalloc.start()
+            result, count = parse(path)
+            gc.collect()
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del result
+
+            print('%-8s %8d %ss  %6.0f bytes/%s' % (name, count, unit, float(retained) / count, unit))
+
+
+if __name__ == '__main__':
+    main()
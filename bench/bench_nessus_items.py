@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+'''
+ReportItem parsing throughput (items/sec) of NessusParser on a synthetic report
+
+See README.md for licensing information and credits
+
+'''
+import os
+import time
+
+from bench_utils import argument_parser, generated, nessus_report, use_parsers, workdir
+
+
+def main():
+    parser = argument_parser('Items/sec of NessusParser(stream=True).iter_hosts() on a synthetic .nessus report')
+    parser.add_argument('--items', action='store', type=int, default=200000,
+                        help='Number of ReportItems in the report (default 200000; the request measured 1000000)'
+    )
+    parser.add_argument('--items-per-host', action='store', type=int, default=100,
+                        help='ReportItems per ReportHost (default 100)'
+    )
+    args = parser.parse_args()
+
+    use_parsers(args.src)
+    import nessus_parser
+
+    hosts = max(1, args.items // args.items_per_host)
+    with workdir(args.workdir) as directory:
+        path = generated(os.path.join(directory, 'items_%d_%d.nessus' % (hosts, args.items_per_host)),
+                         nessus_report, hosts, args.items_per_host)
+
+        items = 0
+        start = time.perf_counter()
+        for host in nessus_parser.NessusParser(path, stream=True).iter_hosts():
+            items += len(host.report_items)
+        elapsed = time.perf_counter() - start
+
+    print('%s: %d items in %.1fs - %d items/sec' % (args.src, items, elapsed, items / elapsed))
+
+
+if __name__ == '__main__':
+    main()
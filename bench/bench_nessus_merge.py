@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+'''
+Run time of merge_nessus_files on sets of overlapping synthetic .nessus files
+
+See README.md for licensing information and credits
+
+'''
+import contextlib
+import io
+import os
+import time
+
+from bench_utils import argument_parser, generated, nessus_report, use_parsers, workdir
+
+
+def main():
+    parser = argument_parser('Time merge_nessus_files() on 10 / 50 / 100 synthetic .nessus files')
+    parser.add_argument('counts', nargs='*', type=int,
+                        help='Numbers of input files to merge (default 10 50 100)'
+    )
+    parser.add_argument('--hosts', action='store', type=int, default=100,
+                        help='ReportHosts per file (default 100)'
+    )
+    parser.add_argument('--items', action='store', type=int, default=10,
+                        help='ReportItems per host (default 10)'
+    )
+    parser.add_argument('--overlap', action='store', type=float, default=0.6,
+                        help='Share of hosts each file has in common with the one before (default 0.6)'
+    )
+    args = parser.parse_args()
+
+    use_parsers(args.src)
+    import nessus_parser
+
+    step = max(1, int(args.hosts * (1 - args.overlap)))
+    with workdir(args.workdir) as directory:
+        for count in args.counts or [10, 50, 100]:
+            files = [generated(os.path.join(directory, 'merge_%d_%d_%03d.nessus' % (args.hosts, args.items, i)),
+                               nessus_report, args.hosts, args.items, plugins=200, start=i * step)
+                     for i in range(count)]
+            outdir = os.path.join(directory, 'merged_%d' % count)
+            if not os.path.exists(outdir):
+                os.mkdir(outdir)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                nessus_parser.merge_nessus_files(files, outdir)
+            print('%3d files: %.2fs' % (count, time.perf_counter() - start), flush=True)
+
+
+if __name__ == '__main__':
+    main()
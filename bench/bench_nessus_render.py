@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+'''
+Compares the xslt and native (Jinja2) renderers of nessus_parser.py -t on synthetic reports
+
+See README.md for licensing information and credits
+
+'''
+import os
+import subprocess
+import sys
+import time
+
+from bench_utils import argument_parser, generated, nessus_report, workdir
+
+# report name: nessus_report() arguments - 'sparse' has far fewer Metasploit / compliance findings
+REPORTS = {'dense': dict(exploit_every=4, compliance_every=7),
+           'sparse': dict(exploit_every=40, compliance_every=70)}
+
+
+def run(src, infile, outdir, renderer):
+    '''
+    Runs nessus_parser.py -t in a child process; returns (seconds, peak RSS in MB)
+    '''
+    start = time.perf_counter()
+    # the transform paths are relative to the checkout
+    process = subprocess.Popen([sys.executable, 'nessus_parser.py', infile, '-o', outdir, '-t', '--renderer', renderer],
+                               cwd=src, stdout=subprocess.DEVNULL)
+    pid, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status:
+        raise RuntimeError('nessus_parser.py -t --renderer %s failed on %s' % (renderer, infile))
+    # ru_maxrss is in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024.0
+
+
+def main():
+    parser = argument_parser('Time and peak memory of nessus_parser.py -t with --renderer xslt and native')
+    parser.add_argument('--hosts', action='store', type=int, default=2000,
+                        help='ReportHosts per report (default 2000)'
+    )
+    parser.add_argument('--items', action='store', type=int, default=50,
+                        help='ReportItems per host (default 50)'
+    )
+    parser.add_argument('--repeat', action='store', type=int, default=3,
+                        help='Runs per measurement; the best is reported (default 3)'
+    )
+    args = parser.parse_args()
+
+    with workdir(args.workdir) as directory:
+        for name in sorted(REPORTS):
+            infile = generated(os.path.join(directory, 'render_%s_%d_%d.nessus' % (name, args.hosts, args.items)),
+                               nessus_report, args.hosts, args.items, **REPORTS[name])
+            outdir = os.path.join(directory, 'render_output')
+            if not os.path.exists(outdir):
+                os.mkdir(outdir)
+
+            for renderer in ['xslt', 'native']:
+                runs = [run(os.path.abspath(args.src), infile, outdir, renderer) for i in range(args.repeat)]
+                print('%-7s %-7s %6.2fs %5.0f MB' % (name, renderer, min(runs)[0], max(rss for seconds, rss in runs)),
+                      flush=True)
+
+
+if __name__ == '__main__':
+    main()
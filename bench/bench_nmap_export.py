@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+'''
+Scaling of the nmap -p export (write_parsed_output) with the number of host / port pairs
+
+See README.md for licensing information and credits
+
+'''
+import os
+import random
+import shutil
+import time
+
+from bench_utils import argument_parser, use_parsers, workdir
+
+
+def services(pairs, service_count, seed=1):
+    '''
+    Host list and service_array of pairs (service, host) pairs over pairs / 10 hosts
+    '''
+    rng = random.Random(seed)
+    host_count = max(1, pairs // 10)
+    hosts = ['10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255) for i in range(host_count)]
+    rng.shuffle(hosts)
+
+    # a few duplicates, as with overlapping scans
+    host_list = hosts + hosts[:host_count // 20]
+    service_array = {}
+    for i in range(pairs):
+        key = ('svc%d' % (i % service_count), str(i % service_count), 'tcp')
+        service_array.setdefault(key, []).append(hosts[i % host_count])
+    return host_list, service_array
+
+
+def main():
+    parser = argument_parser('Time write_parsed_output() (parsed/hosts.txt and parsed/services/*) by host / port pairs')
+    parser.add_argument('pairs', nargs='*', type=int,
+                        help='Numbers of host / port pairs (default 100000 1000000 2000000)'
+    )
+    parser.add_argument('--services', action='store', type=int, default=2000,
+                        help='Number of distinct service files (default 2000)'
+    )
+    args = parser.parse_args()
+
+    use_parsers(args.src)
+    import nmap_parser
+
+    with workdir(args.workdir) as directory:
+        outdir = os.path.join(directory, 'export')
+        for pairs in args.pairs or [100000, 1000000, 2000000]:
+            host_list, service_array = services(pairs, args.services)
+            shutil.rmtree(outdir, ignore_errors=True)
+            os.mkdir(outdir)
+
+            start = time.perf_counter()
+            nmap_parser.write_parsed_output(outdir, host_list, service_array)
+            elapsed = time.perf_counter() - start
+            print('%8d pairs: %.2fs (%.2f us/pair)' % (pairs, elapsed, elapsed * 1e6 / pairs), flush=True)
+
+
+if __name__ == '__main__':
+    main()
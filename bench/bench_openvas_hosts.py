@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+'''
+OpenvasParser parse time as the number of report hosts and results grows
+
+See README.md for licensing information and credits
+
+'''
+import os
+import time
+
+from bench_utils import argument_parser, generated, openvas_report, use_parsers, workdir
+
+SIZES = [(1000, 50000), (5000, 50000), (20000, 50000), (20000, 200000)]
+
+
+def size(text):
+    hosts, results = text.split('x')
+    return int(hosts), int(results)
+
+
+def main():
+    parser = argument_parser('Parse time of OpenvasParser on synthetic GVM exports of growing host / result counts')
+    parser.add_argument('sizes', nargs='*', type=size,
+                        help='HOSTSxRESULTS report sizes (default %s)' % ' '.join('%dx%d' % s for s in SIZES)
+    )
+    args = parser.parse_args()
+
+    use_parsers(args.src)
+    import openvas_parser
+
+    with workdir(args.workdir) as directory:
+        for hosts, results in args.sizes or SIZES:
+            path = generated(os.path.join(directory, 'openvas_%d_%d.xml' % (hosts, results)),
+                             openvas_report, hosts, results)
+
+            start = time.perf_counter()
+            parser = openvas_parser.OpenvasParser(path)
+            elapsed = time.perf_counter() - start
+            attached = sum(len(host.report_items) for report in parser.reports for host in report.hosts)
+            print('%6d hosts %7d results: %7.2fs (%d results attached)' % (hosts, results, elapsed, attached), flush=True)
+
+
+if __name__ == '__main__':
+    main()
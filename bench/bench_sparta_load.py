@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+'''
+SpartaParser load time as the number of hosts in a SPARTA project grows
+
+See README.md for licensing information and credits
+
+'''
+import os
+import time
+
+from bench_utils import argument_parser, generated, sparta_project, use_parsers, workdir
+
+
+def main():
+    parser = argument_parser('Load time of SpartaParser on synthetic .sprt projects of growing size')
+    parser.add_argument('hosts', nargs='*', type=int,
+                        help='Numbers of hosts (default 250 500 1000 5000)'
+    )
+    parser.add_argument('--ports', action='store', type=int, default=7,
+                        help='Open ports per host, at most 7 (default 7)'
+    )
+    args = parser.parse_args()
+
+    use_parsers(args.src)
+    import sparta_parser
+
+    with workdir(args.workdir) as directory:
+        for hosts in args.hosts or [250, 500, 1000, 5000]:
+            path = generated(os.path.join(directory, 'sparta_%d_%d.sprt' % (hosts, args.ports)),
+                             sparta_project, hosts, args.ports)
+
+            start = time.perf_counter()
+            parser = sparta_parser.SpartaParser(path)
+            elapsed = time.perf_counter() - start
+            ports = sum(len(host.ports) for host in parser.hosts)
+            print('%5d hosts %6d ports: %.2fs' % (len(parser.hosts), ports, elapsed), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+'''
+Helpers shared by the benchmark scripts in this directory - synthetic scan generators,
+and loading the parser modules from another checkout so the same benchmark can be run
+before and after a change, e.g.
+
+    git worktree add /tmp/parsers-before <revision>
+    python bench/bench_nessus_items.py --src /tmp/parsers-before
+    python bench/bench_nessus_items.py
+
+See README.md for licensing information and credits
+
+'''
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def argument_parser(description):
+    '''
+    ArgumentParser with the --src / --workdir options every benchmark takes
+    '''
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--src', action='store', default=REPO_DIR,
+                        help='Directory holding the parser modules to benchmark, e.g. a git worktree of an '
+                             'older revision (defaults to this checkout)'
+    )
+    parser.add_argument('--workdir', action='store',
+                        help='Directory for the generated inputs, which are reused if already there '
+                             '(defaults to a temporary directory, removed afterwards)'
+    )
+    return parser
+
+def use_parsers(src):
+    '''
+    Puts the parser modules in src first on the import path
+    '''
+    sys.path.insert(0, os.path.abspath(src))
+
+@contextmanager
+def workdir(path=None):
+    if path:
+        if not os.path.exists(path):
+            os.makedirs(path)
+        yield path
+        return
+
+    path = tempfile.mkdtemp(prefix='parsers-bench-')
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path)
+
+def generated(path, generator, *args, **kwargs):
+    '''
+    Returns path, first writing it with generator(path, *args, **kwargs) unless it exists
+    '''
+    if not os.path.exists(path):
+        generator(path, *args, **kwargs)
+    return path
+
+
+def nessus_report(path, hosts=50, items=20, plugins=40, start=0, exploit_every=4, compliance_every=7):
+    '''
+    Writes a .nessus file with hosts ReportHosts (numbered from start, so files with
+    overlapping ranges share hosts) of items ReportItems each, drawn from plugins plugins;
+    every exploit_every / compliance_every-th plugin carries Metasploit / compliance data
+    '''
+    rng = random.Random(hosts * items + start)
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" ?>\n<NessusClientData_v2 xmlns:cm="http://www.nessus.org/cm">'
+                '<Policy><policyName>bench</policyName></Policy>\n<Report name="Scan">\n')
+        for h in range(start, start + hosts):
+            ip = '10.%d.%d.%d' % (h >> 16 & 255, h >> 8 & 255, h & 255)
+            f.write('<ReportHost name="%s"><HostProperties><tag name="HOST_END">Mon</tag><tag name="host-ip">%s</tag>'
+                    '<tag name="host-fqdn">h%d.local</tag><tag name="operating-system">Linux</tag>'
+                    '<tag name="HOST_START">Sun</tag></HostProperties>\n' % (ip, ip, h))
+            for i in range(items):
+                p = rng.randrange(plugins)
+                plugin_id = 66334 if p == 0 else 10000 + p
+                f.write('<ReportItem port="%d" svc_name="www" protocol="tcp" severity="%d" pluginID="%d" '
+                        'pluginName="Plugin%d Issues(x)-y" pluginFamily="Misc">'
+                        % (rng.choice([0, 22, 80, 443, 445]), p % 5, plugin_id, p))
+                f.write('<description>Desc %d\n  - bullet\n -b2\n\n  para\n\n q     w\n    x\n   y\n  z\n a &amp;</description>'
+                        '<solution>Sol\n  - a\n -b\n  c\n d</solution><synopsis>Syn\n  more</synopsis>' % p)
+                f.write('<cvss_base_score>%d.0</cvss_base_score><cvss_vector>CVSS2#AV:N/AC:L</cvss_vector>'
+                        '<cvss3_base_score>7.5</cvss3_base_score><cvss3_vector>CVSS:3.0/AV:N</cvss3_vector>'
+                        '<risk_factor>High</risk_factor><plugin_type>remote</plugin_type>'
+                        '<see_also>http://a\nhttp://b</see_also>' % (p % 10))
+                if p % 3 == 0:
+                    f.write('<cve>CVE-2020-%04d</cve><cve>CVE-2021-%04d</cve><bid>%d</bid><xref>OSVDB:1</xref>' % (p, p, p))
+                if p % exploit_every == 0:
+                    f.write('<exploit_framework_metasploit>true</exploit_framework_metasploit>'
+                            '<metasploit_name>MS %d</metasploit_name>' % p)
+                if p % compliance_every == 0:
+                    f.write('<cm:compliance-result>PASSED</cm:compliance-result>'
+                            '<cm:compliance-check-name>chk%d</cm:compliance-check-name><compliance>true</compliance>' % p)
+                f.write('<plugin_output>out %d on %s</plugin_output></ReportItem>\n' % (i, ip))
+            f.write('</ReportHost>\n')
+        f.write('</Report>\n</NessusClientData_v2>\n')
+
+
+NMAP_SERVICES = {21: 'ftp', 22: 'ssh', 80: 'http', 443: 'https', 8080: 'http-proxy', 8443: 'https-alt',
+                 445: 'microsoft-ds', 3389: 'ms-wbt-server'}
+
+def nmap_scan(path, hosts=50, ports=10, start=0, down_ratio=0.3):
+    '''
+    Writes an nmap XML file with hosts hosts (numbered from start, a down_ratio share of
+    them down) with up to 16 ports each in a mix of states and services
+    '''
+    rng = random.Random(hosts * ports + start)
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE nmaprun>\n'
+                '<?xml-stylesheet href="file:///usr/share/nmap/nmap.xsl" type="text/xsl"?>\n'
+                '<nmaprun scanner="nmap" args="nmap -sV -oX bench.xml" start="1" startstr="Mon" version="7.80" '
+                'xmloutputversion="1.04">\n<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>\n'
+                '<verbose level="0"/>\n<debugging level="0"/>\n')
+        for h in range(start, start + hosts):
+            ip = '10.%d.%d.%d' % (h >> 16 & 255, h >> 8 & 255, h & 255)
+            if rng.random() < down_ratio:
+                f.write('<host><status state="down" reason="no-response" reason_ttl="0"/>\n'
+                        '<address addr="%s" addrtype="ipv4"/>\n<hostnames>\n</hostnames>\n<ports></ports>\n</host>\n' % ip)
+                continue
+
+            f.write('<host starttime="1" endtime="2"><status state="up" reason="echo-reply" reason_ttl="63"/>\n'
+                    '<address addr="%s" addrtype="ipv4"/>\n<address addr="00:11:22:33:44:%02X" addrtype="mac" vendor="Acme"/>\n'
+                    '<hostnames>\n<hostname name="h%d.local" type="PTR"/>\n</hostnames>\n<ports>'
+                    '<extraports state="closed" count="990"><extrareasons reason="resets" count="990"/></extraports>\n'
+                    % (ip, h % 256, h))
+            for port in rng.sample(sorted(NMAP_SERVICES) + [23, 25, 53, 110, 139, 143, 3306, 5432], min(ports, 16)):
+                service = NMAP_SERVICES.get(port) or rng.choice(['unknown', 'tcpwrapped', 'smtp', 'domain', 'mysql'])
+                f.write('<port protocol="tcp" portid="%d"><state state="%s" reason="syn-ack" reason_ttl="63"/>'
+                        '<service name="%s" product="Prod" version="1.%d" extrainfo="x" method="probed" conf="10"/>'
+                        % (port, rng.choice(['open', 'open', 'open', 'closed', 'filtered']), service, port % 7))
+                if port in (80, 443):
+                    f.write('<script id="http-title" output="Title %d"/>' % h)
+                f.write('</port>\n')
+            f.write('</ports>\n<os><osmatch name="Linux 3.X" accuracy="95" line="1"><osclass type="general purpose" '
+                    'vendor="Linux" osfamily="Linux" osgen="3.X" accuracy="95"/></osmatch></os>\n'
+                    '<hostscript><script id="smb-os-discovery" output="os %d"/></hostscript>\n</host>\n'
+                    '<output type="interactive">Nmap scan report for %s\n</output>\n' % (h, ip))
+        f.write('<runstats><finished time="2" timestr="Mon" elapsed="1" exit="success"/>'
+                '<hosts up="1" down="0" total="1"/></runstats>\n</nmaprun>\n')
+
+def openvas_report(path, hosts=20, results=200, nvts=30, missing=2):
+    '''
+    Writes a GVM XML report export with hosts report hosts and results results drawn from
+    nvts NVTs, spread over the hosts and missing further IPs absent from the host list
+    '''
+    rng = random.Random(hosts * results)
+    ips = ['192.168.%d.%d' % (h // 250, h % 250 + 1) for h in range(hosts)]
+    others = ['10.9.9.%d' % i for i in range(missing)]
+    with open(path, 'w') as f:
+        f.write('<report id="r1"><report id="r1"><gmp><version>8.0</version></gmp>\n')
+        for ip in ips:
+            f.write('<host><ip>%s</ip><asset asset_id="a"/><start>2020-01-01</start><end>2020-01-02</end>'
+                    '<detail><name>best_os_txt</name><value>Linux</value></detail>'
+                    '<detail><name>hostname</name><value>h-%s</value></detail>'
+                    '<detail><name>best_os_cpe</name><value>cpe:/o:linux</value></detail></host>\n' % (ip, ip))
+        f.write('<results max="1" start="1">\n')
+        for r in range(results):
+            n = rng.randrange(nvts)
+            ip = rng.choice(ips + others)
+            port = rng.choice(['general/icmp', '22/tcp', 'ntp (123/udp)', 'general/tcp', '443/tcp'])
+            f.write('<result id="res%d"><name>Nvt%d Issues(x)-y</name><comment/><creation_time>t</creation_time>'
+                    '<host>%s<asset asset_id="a"/><hostname/></host><port>%s</port>' % (r, n, ip, port))
+            f.write('<nvt oid="1.3.6.1.4.1.25623.1.0.%d"><type>nvt</type><name>Nvt%d</name><family>Fam</family>'
+                    '<cvss_base>%d.0</cvss_base><tags>cvss_base_vector=AV:N/AC:L|summary=Summary %d\n  - item\n\n  para'
+                    '     x\n y|insight=Ins\n -x|affected=All|impact=Bad|solution=Fix\n  - a\n b|vuldetect=Detect|'
+                    'solution_type=VendorFix|qod_type=remote_banner</tags>' % (n, n, n % 10, n))
+            f.write('<refs><ref type="cve" id="CVE-2019-%04d"/><ref type="cve" id="CVE-2020-%04d"/>'
+                    '<ref type="url" id="http://x/%d"/><ref type="cert-bund" id="CB-K%d"/><ref type="dfn-cert" id="DFN-%d"/>'
+                    '%s</refs></nvt>' % (n, n, n, n, n, '<ref type="bid" id="%d"/>' % n if n % 2 else ''))
+            f.write('<scan_nvt_version>1</scan_nvt_version><threat>High</threat><severity>%d.0</severity>'
+                    '<qod><value>80</value></qod><description>Out %d\n  -x</description><original_threat>High</original_threat>'
+                    '<original_severity>5.0</original_severity><notes/><overrides/></result>\n' % (n % 10, r))
+        f.write('</results></report></report>\n')
+
+SPARTA_SCHEMA = '''
+CREATE TABLE db_tables_nmap_host (id INTEGER PRIMARY KEY, checked TEXT, os_match TEXT, os_accuracy TEXT, ip TEXT,
+    ipv4 TEXT, ipv6 TEXT, macaddr TEXT, status TEXT, hostname TEXT, vendor TEXT, uptime TEXT, lastboot TEXT,
+    distance TEXT, state TEXT, count TEXT);
+CREATE TABLE db_tables_nmap_service (id INTEGER PRIMARY KEY, name TEXT, product TEXT, version TEXT, extrainfo TEXT,
+    fingerprint TEXT);
+CREATE TABLE db_tables_nmap_port (id INTEGER PRIMARY KEY, port_id TEXT, protocol TEXT, state TEXT, host_id TEXT,
+    service_id TEXT, script_id TEXT);
+CREATE TABLE db_tables_nmap_script (id INTEGER PRIMARY KEY, script_id TEXT, output TEXT, port_id TEXT, host_id TEXT);
+CREATE TABLE db_tables_process (pid TEXT, id INTEGER PRIMARY KEY, display TEXT, name TEXT, tabtitle TEXT, hostip TEXT,
+    port TEXT, protocol TEXT, command TEXT, starttime TEXT, endtime TEXT, outputfile TEXT, status TEXT, closed TEXT,
+    estimatedremaining INTEGER, elapsed INTEGER);
+CREATE TABLE db_tables_process_output (id INTEGER PRIMARY KEY, process_id INTEGER, output TEXT);
+'''
+
+def sparta_project(path, hosts=20, ports=5):
+    '''
+    Writes a SPARTA .sprt project database with hosts hosts of ports (up to 7) open ports
+    each, with host / port scripts and a few tool runs (and their output) per port
+    '''
+    rng = random.Random(hosts * ports)
+    connection = sqlite3.connect(path)
+    connection.executescript(SPARTA_SCHEMA)
+    service_id = 0
+    process_id = 0
+
+    def process(name, ip, port, protocol, pid, status):
+        connection.execute("""INSERT INTO db_tables_process (pid, id, name, hostip, port, protocol, command,
+                              starttime, endtime, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                           (pid, process_id, name, ip, port, protocol, '%s %s' % (name, ip), 's', 'e', status))
+        connection.execute("INSERT INTO db_tables_process_output (process_id, output) VALUES (?, ?)",
+                           (process_id, 'out %d' % process_id))
+
+    for h in range(1, hosts + 1):
+        ip = '10.1.%d.%d' % (h // 250, h % 250)
+        connection.execute("INSERT INTO db_tables_nmap_host VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (h, 'False', 'Linux', 95, ip, ip, '', '00:11', 'up', 'h%d' % h, 'Acme', '', '', '', '', ''))
+        if h % 2:
+            connection.execute("INSERT INTO db_tables_nmap_script (script_id, output, port_id, host_id) VALUES (?, ?, ?, ?)",
+                               ('smb-os', 'os%d' % h, '', str(h)))
+        process_id += 1
+        process('traceroute', ip, '', '', 100, 'Finished')
+
+        for port in rng.sample([21, 22, 80, 443, 445, 3389, 8080], min(ports, 7)):
+            service_id += 1
+            connection.execute("INSERT INTO db_tables_nmap_service VALUES (?, ?, ?, ?, ?, ?)",
+                               (service_id, 'svc%d' % port, 'prod', '1.0', 'x', ''))
+            connection.execute("""INSERT INTO db_tables_nmap_port (id, port_id, protocol, state, host_id, service_id)
+                                  VALUES (?, ?, ?, ?, ?, ?)""", (service_id, str(port), 'tcp', 'open', str(h), str(service_id)))
+            if port in (80, 443):
+                connection.execute("""INSERT INTO db_tables_nmap_script (script_id, output, port_id, host_id)
+                                      VALUES (?, ?, ?, ?)""", ('http-title', 't%d' % h, str(service_id), str(h)))
+            for name, status, pid in (('nikto', 'Finished', 100), ('nmap', 'Finished', 100), ('dirb', 'Running', 100),
+                                      ('screenshooter', 'Finished', -1)):
+                process_id += 1
+                process(name, ip, str(port), 'tcp', pid, status)
+    connection.commit()
+    connection.close()
@@ -16,8 +16,14 @@ See README.md for licensing information and credits
 
 '''
 import argparse
+import copy
+import mmap
 import os
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
 try:
     from lxml import etree
@@ -26,6 +32,32 @@ except:
     print("pip install lxml")
     print("     ----- OR -----")
     print("apt-get install python-lxml")
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # only needed for the columnar (Parquet) export
+    pa = pq = None
+
+try:
+    import numpy as np
+except ImportError:
+    # only needed for NessusFindingsTable
+    np = None
+
+try:
+    from jinja2 import Environment, FileSystemLoader
+except ImportError:
+    # only needed for --renderer native
+    Environment = None
+
+try:
+    from .text_normalizer import TextNormalizer, normalize_name, normalize_paragraph, normalize_solution, normalize_synopsis
+    from .parser_utils import ParseCache, SlottedModel, compiled_transform, ip_sort_key, model_signature, parallel_map
+except ImportError:
+    from text_normalizer import TextNormalizer, normalize_name, normalize_paragraph, normalize_solution, normalize_synopsis
+    from parser_utils import ParseCache, SlottedModel, compiled_transform, ip_sort_key, model_signature, parallel_map
     
 
 def main():
@@ -51,17 +83,39 @@ def main():
                         help='Run XSLT transforms on specified .xml files',
                         action='store_true'
     )
+    parser.add_argument('--concurrent-transforms',
+                        help='Run the transforms for each file concurrently in threads',
+                        action='store_true'
+    )
+    parser.add_argument('--renderer', action='store', choices=['xslt', 'native'], default='xslt',
+                        help='Produce the -t reports with the XSLT stylesheets (default) or the native Jinja2 templates'
+    )
     parser.add_argument('-p', '--parse',
                         help='Parse nessus output files',
                         action='store_true'
     )
+    parser.add_argument('--parquet',
+                        help='Write the findings of all input files to nessus_findings.parquet in the output directory (requires pyarrow)',
+                        action='store_true'
+    )
+    parser.add_argument('-j', '--jobs', action='store', type=int, default=1,
+                        help='Number of worker processes used to parse / transform multiple files (default 1)'
+    )
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='Do not read or update the parse cache kept in the output directory'
+    )
     args = parser.parse_args()
     
     target = args.nessus_input
     outdir = args.outdir
     is_merge = args.merge_files
     is_transform = args.transform
+    concurrent_transforms = args.concurrent_transforms
+    renderer = args.renderer
     is_parse = args.parse
+    is_parquet = args.parquet
+    jobs = args.jobs
+    use_cache = args.cache
 
     
     #------------------------------------------------------------------------------
@@ -69,11 +123,18 @@ def main():
     #
     # [0] - name, which will be prepended to output file
     # [1] - location of transform file to apply
+    # [2] - ReportItemFilter selecting the only ReportItems the transform looks at
+    #       (None to transform the full document)
+    # [3] - Jinja2 template in templates/ producing the same report (--renderer native)
     #------------------------------------------------------------------------------
     transforms = []
-    transforms.append(["patch_report", "./transforms/nessus_patch_status.xslt"])
-    transforms.append(["compliance_report", "./transforms/nessus_compliance_report.xslt"])
-    transforms.append(["metasploit_report", "./transforms/nessus_metasploit_available.xslt"])
+    transforms.append(["patch_report", "./transforms/nessus_patch_status.xslt",
+                       ReportItemFilter(plugin_ids=['66334']), "nessus_patch_status.html"])
+    transforms.append(["compliance_report", "./transforms/nessus_compliance_report.xslt",
+                       ReportItemFilter(elements={'compliance': 'true'}), "nessus_compliance_report.html"])
+    transforms.append(["metasploit_report", "./transforms/nessus_metasploit_available.xslt",
+                       ReportItemFilter(elements={'exploit_framework_metasploit': 'true'}),
+                       "nessus_metasploit_available.html"])
     
     #------------------------------------------------------------------------------
     # Main stuff
@@ -109,35 +170,103 @@ def main():
         infile_list.append(os.path.join(outdir,"combined_report.nessus"))
     
     if is_transform:        
-        for infile in infile_list:
-            for transform in transforms:
-                outfile_base = transform[0]
-                outfile_base += os.path.splitext(os.path.basename(infile))[0]
-                outfile_base = os.path.join(outdir,outfile_base)
-                transform_to_html(infile,outfile_base+'.html',transform[1])
+        # Each file is parsed once and all transforms are applied to the same document
+        if renderer == 'native':
+            transform_jobs = [(infile, outdir, transforms) for infile in infile_list]
+            results = parallel_map(_render_reports, transform_jobs, jobs)
+        else:
+            transform_jobs = [(infile, outdir, transforms, concurrent_transforms) for infile in infile_list]
+            results = parallel_map(_run_transforms, transform_jobs, jobs)
+        for infile, timings in zip(infile_list, results):
+            for name, seconds in timings:
+                print('[*] %s %s: %.2fs' % (name, os.path.basename(infile), seconds))
     
     #This currently doesnt really do anything - for debug purposes only            
-    if is_parse:
-        for infile in infile_list:
-            parse_xml(infile)
+    if is_parse and infile_list:
+        parse_xml(infile_list, jobs, outdir if use_cache else '')
+
+    if is_parquet and infile_list:
+        outfile = os.path.join(outdir, "nessus_findings.parquet")
+        rows = NessusParser(infile_list, stream=True).write_parquet(outfile)
+        print('[*] %d findings written to %s' % (rows, outfile))
         
     print("\n\nComplete!")
     print("Output data located at " + outdir)
 
-def parse_xml(filename_xml):
-    parser = NessusParser(filename_xml)
+def parse_xml(filename_xml, workers=1, cache_dir=''):
+    parser = NessusParser(filename_xml, workers=workers, cache_dir=cache_dir)
 
-def transform_to_html(infile, outfile, xsl):
+def transform_to_html(infile, outfile, xsl, item_filter=None):
     '''
     accepts a nessus xml file and transform and exports to html
+
+    If item_filter (a ReportItemFilter) is given, the transform is applied to a slim copy
+    of the file holding only the matching ReportItems
     '''
     
+    if item_filter:
+        dom = slim_documents(infile, [item_filter])[0]
+    else:
+        dom = etree.parse(infile)
+    _apply_transform(dom, xsl, outfile)
+
+def run_transforms(infile, outdir, transforms, concurrent=False):
+    '''
+    Applies every [name, xsl] or [name, xsl, item_filter] transform to infile, writing
+    each to <outdir>/<name><input file name>.html
+
+    Transforms with an item_filter get a slim document built for them by a single
+    streaming pass over the file (see slim_documents); the full document is only
+    parsed - once - for transforms without one.
+
+    With concurrent=True the transforms run in threads (lxml releases the GIL while
+    applying a stylesheet). Returns [(step, seconds)] for the parse / pre-filter pass
+    and each transform.
+    '''
+    timings = []
+    filters = [transform[2] if len(transform) > 2 else None for transform in transforms]
+    docs = [None] * len(transforms)
+
+    if any(filters):
+        start = time.time()
+        slim = iter(slim_documents(infile, [item_filter for item_filter in filters if item_filter]))
+        docs = [next(slim) if item_filter else None for item_filter in filters]
+        timings.append(('prefilter', time.time() - start))
+
+    if not all(filters):
+        start = time.time()
+        dom = etree.parse(infile)
+        docs = [doc if doc is not None else dom for doc in docs]
+        timings.append(('parse', time.time() - start))
+
+    base = os.path.splitext(os.path.basename(infile))[0]
+    jobs = [(doc, transform[0], transform[1], os.path.join(outdir, transform[0] + base + '.html'))
+            for doc, transform in zip(docs, transforms)]
+
+    if concurrent and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            timings.extend(pool.map(lambda job: _timed_transform(*job, private=True), jobs))
+    else:
+        timings.extend(_timed_transform(*job) for job in jobs)
+
+    return timings
+
+def _timed_transform(dom, name, xsl, outfile, private=False):
+    start = time.time()
+    _apply_transform(dom, xsl, outfile, private)
+    return name, time.time() - start
+
+def _apply_transform(dom, xsl, outfile, private=False):
+    '''
+    Applies the stylesheet xsl to dom and writes the result to outfile; private=True
+    uses a separate copy of the compiled stylesheet (one per thread)
+    '''
     output = ''
-    dom = etree.parse(infile)
     
     try:
-        xslt = etree.parse(xsl)
-        transform = etree.XSLT(xslt)
+        transform = compiled_transform(xsl)
+        if private:
+            transform = copy.copy(transform)
         output = etree.tostring(transform(dom), pretty_print=True)
         
         output_file(outfile,output)
@@ -148,47 +277,292 @@ def transform_to_html(infile, outfile, xsl):
         print(' -  make sure that the XSL transform is present and valid:')
         print(' -  ' + xsl)
 
+def _run_transforms(args):
+    '''
+    Worker process entry point for run_transforms
+    '''
+    return run_transforms(*args)
+
+def render_reports(infile, outdir, transforms):
+    '''
+    Native alternative to run_transforms: renders the Jinja2 template ([3]) of each
+    transform to <outdir>/<name><input file name>.html from a single streaming pass of
+    NessusParser over infile, in place of applying the XSLT stylesheet
+
+    Only what the bundled reports show is kept per host (patch detail, compliance
+    results and Metasploit findings) and hosts are ordered by their full IP address.
+    Returns [(step, seconds)] for the parse pass and each report.
+    '''
+    if Environment is None:
+        raise ImportError("jinja2 module not found; try pip install jinja2")
+
+    start = time.time()
+    hosts = []
+    for host in NessusParser([infile], stream=True).iter_hosts():
+        has_patch = False
+        patch_detail = ''
+        compliance = []
+        metasploit = []
+        for item in host.report_items:
+            if item.plugin_id == '66334':
+                if not has_patch:
+                    has_patch = True
+                    patch_detail = item.plugin_output or ''
+            if item.compliance == 'true':
+                if item.compliance_result is not None and item.compliance_result != 'ERROR':
+                    compliance.append(item)
+            if item.plugin.exploit_framework_metasploit == 'true':
+                metasploit.append(item)
+
+        compliance.sort(key=lambda item: item.compliance_result)
+        hosts.append({'name': host.name, 'fqdn': host.host_fqdn or '', 'has_patch': has_patch,
+                      'patch_detail': patch_detail, 'compliance': compliance, 'metasploit': metasploit})
+
+    hosts.sort(key=lambda host: ip_sort_key(host['name']))
+    timings = [('parse', time.time() - start)]
+
+    base = os.path.splitext(os.path.basename(infile))[0]
+    for transform in transforms:
+        start = time.time()
+        template = _template_environment().get_template(transform[3])
+        template.stream(hosts=hosts).dump(os.path.join(outdir, transform[0] + base + '.html'), encoding='utf-8')
+        timings.append((transform[0], time.time() - start))
+
+    return timings
+
+def _render_reports(args):
+    '''
+    Worker process entry point for render_reports
+    '''
+    return render_reports(*args)
+
+# Jinja2 environment for the native report templates, created on first use
+_environment = None
+
+def _template_environment():
+    global _environment
+    if _environment is None:
+        templates = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+        _environment = Environment(loader=FileSystemLoader(templates), autoescape=True)
+    return _environment
+
+def slim_documents(infile, item_filters):
+    '''
+    Streams a .nessus file once and returns one document per ReportItemFilter, each a
+    copy of the file with only the ReportItems matching that filter (hosts, their
+    HostProperties and everything outside the hosts are kept as is)
+
+    Only the host being processed is ever held from the original file.
+    '''
+    slim_hosts = [[] for item_filter in item_filters]
+
+    context = etree.iterparse(infile, events=('end',), tag='ReportHost')
+    for event, host in context:
+        report = host.getparent()
+        selections = [item_filter.select(host) for item_filter in item_filters]
+
+        # Elements wanted by a single filter are moved over, the rest are copied
+        wanted = {}
+        for selection in selections:
+            for child in selection:
+                wanted[child] = wanted.get(child, 0) + 1
+
+        for selection, hosts in zip(selections, slim_hosts):
+            slim_host = etree.Element(host.tag, host.attrib, nsmap=host.nsmap)
+            slim_host.text = host.text
+            slim_host.tail = host.tail
+            for child in selection:
+                wanted[child] -= 1
+                slim_host.append(copy.deepcopy(child) if wanted[child] else child)
+            hosts.append((report, slim_host))
+
+        host.clear()
+        while host.getprevious() is not None:
+            del host.getparent()[0]
+
+    # What is left of the original is the document minus its hosts (bar the last one,
+    # which has been emptied but not removed)
+    root = context.root
+    reports = root.findall('Report')
+    for report in reports:
+        for host in report.findall('ReportHost'):
+            report.remove(host)
+
+    docs = []
+    for hosts in slim_hosts:
+        doc = copy.deepcopy(root)
+        doc_reports = doc.findall('Report')
+        for report, slim_host in hosts:
+            doc_reports[reports.index(report)].append(slim_host)
+        docs.append(etree.ElementTree(doc))
+    return docs
+
+
+class ReportItemFilter(object):
+    '''
+    Declares the ReportItems a transform depends on: an item matches if its pluginID
+    is in plugin_ids or one of its child elements named in elements ({tag: text}) holds
+    the given text (tags may use the cm: compliance namespace prefix)
+
+    The test is compiled into a single XPath expression which select() evaluates
+    once per ReportHost.
+    '''
+    def __init__(self, plugin_ids=(), elements=None):
+        self._compile(plugin_ids, elements)
+
+    def _compile(self, plugin_ids, elements):
+        self.plugin_ids = [str(plugin_id) for plugin_id in plugin_ids]
+        self.elements = dict(elements or {})
+
+        tests = ['@pluginID=%s' % _xpath_literal(plugin_id) for plugin_id in self.plugin_ids]
+        tests += ['%s=%s' % (tag, _xpath_literal(text)) for tag, text in self.elements.items()]
+        self._select = etree.XPath('*[not(self::ReportItem) or self::ReportItem[%s]]' % (' or '.join(tests) or 'false()'),
+                                   namespaces={'cm': 'http://www.nessus.org/cm'})
+
+    def select(self, host):
+        '''
+        Children of the ReportHost element host to keep, in document order
+        '''
+        return self._select(host)
+
+    # compiled XPath objects do not pickle - recompile when sent to a worker process
+    def __getstate__(self):
+        return (self.plugin_ids, self.elements)
+
+    def __setstate__(self, state):
+        self._compile(*state)
+
+def _xpath_literal(text):
+    if "'" not in text:
+        return "'%s'" % text
+    if '"' not in text:
+        return '"%s"' % text
+    return "concat('%s')" % "', \"'\", '".join(text.split("'"))
+
+
 def output_file(outfile, output, overwrite=True):
     if overwrite == True:
-        f = open(outfile, 'w+')
+        f = open(outfile, 'wb+')
     else:
-        f = open(outfile, 'w')
+        f = open(outfile, 'wb')
     
     f.write(output)
-    f.close
+    f.close()
 
 def merge_nessus_files(infile_list, outdir):
+    '''
+    Merges .nessus files into combined_report.nessus in outdir; hosts are merged by
+    name and findings by (port, pluginID), with the first file seen winning
+
+    Inputs are streamed with iterparse and hosts / new findings are spooled to a
+    temporary file as they are found, so only a compact index of host names, spool
+    offsets and (port, pluginID) keys is held in memory. The merged report is then
+    written host by host through etree.xmlfile.
+    '''
     # logic borrowed from https://gist.github.com/mastahyeti/2720173
 
-    first = 1
-    for infile in infile_list:
-          if first:
-             mainTree = etree.parse(infile)
-             report = mainTree.find('Report')
-             report.attrib['name'] = 'Merged Report'
-             first = 0
-          else:
-             tree = etree.parse(infile)
-             for host in tree.findall('.//ReportHost'):
-                existing_host = report.find(".//ReportHost[@name='"+host.attrib['name']+"']")
-                if not existing_host:
-                    print("adding host: " + host.attrib['name'])
-                    report.append(host)
+    # host name -> list of (offset, length) spool segments; the first segment is the
+    # full ReportHost, any later ones are single ReportItems merged in from other files
+    host_segments = {}
+    item_index = {}
+    root = None
+    report = None
+    preamble = []
+
+    with tempfile.TemporaryFile(dir=outdir) as spool:
+        for file_index, infile in enumerate(infile_list):
+            first_file = file_index == 0
+            depth = 0
+            for event, elem in etree.iterparse(infile, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if root is None:
+                        root = (elem.tag, dict(elem.attrib), elem.nsmap)
+                    elif report is None and elem.tag == 'Report':
+                        report = (dict(elem.attrib), elem.nsmap)
+                    continue
+
+                depth -= 1
+                if elem.tag == 'ReportHost':
+                    _spool_report_host(elem, spool, host_segments, item_index, not first_file)
+                elif depth == 1 and elem.tag != 'Report':
+                    # Policy etc is kept as-is from the first file
+                    if first_file:
+                        preamble.append(etree.tostring(elem))
                 else:
-                    for item in host.findall('ReportItem'):
-                        if not existing_host.find("ReportItem[@port='"+ item.attrib['port'] +"'][@pluginID='"+ item.attrib['pluginID'] +"']"):
-                            print("adding finding: " + item.attrib['port'] + ":" + item.attrib['pluginID'])
-                            existing_host.append(item)
-          print(":: => done.")    
-       
-    mainTree.write(os.path.join(outdir,"combined_report.nessus"), encoding="utf-8", xml_declaration=True)
-
-class NessusReport(object):
+                    continue
+
+                # Free processed elements so the tree never grows past the current host
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+            print(":: => done.")
+
+        report_attrib, report_nsmap = report
+        report_attrib['name'] = 'Merged Report'
+        root_tag, root_attrib, root_nsmap = root
+
+        with etree.xmlfile(os.path.join(outdir,"combined_report.nessus"), encoding="utf-8") as xf:
+            xf.write_declaration()
+            with xf.element(root_tag, root_attrib, nsmap=root_nsmap):
+                for segment in preamble:
+                    xf.write(etree.fromstring(segment))
+                with xf.element('Report', report_attrib, nsmap=report_nsmap):
+                    for segments in host_segments.values():
+                        host = etree.fromstring(_read_segment(spool, segments[0]))
+                        for segment in segments[1:]:
+                            host.append(etree.fromstring(_read_segment(spool, segment)))
+                        xf.write(host)
+
+def _spool_report_host(host, spool, host_segments, item_index, verbose=True):
+    '''
+    Writes a ReportHost (first time its name is seen) or its findings that are not
+    already present (host seen in an earlier file) to the merge spool
+    '''
+    host_name = host.get('name')
+    host.tail = None
+    spool.seek(0, os.SEEK_END)
+
+    if host_name not in host_segments:
+        if verbose:
+            print("adding host: " + host_name)
+        host_segments[host_name] = [_write_segment(spool, etree.tostring(host))]
+        item_index[host_name] = set(_report_item_key(item) for item in host.iterchildren('ReportItem'))
+        return
+
+    existing_items = item_index[host_name]
+    for item in host.iterchildren('ReportItem'):
+        key = _report_item_key(item)
+        if key not in existing_items:
+            print("adding finding: " + item.get('port') + ":" + item.get('pluginID'))
+            item.tail = None
+            host_segments[host_name].append(_write_segment(spool, etree.tostring(item)))
+            existing_items.add(key)
+
+def _write_segment(spool, data):
+    offset = spool.tell()
+    spool.write(data)
+    return (offset, len(data))
+
+def _read_segment(spool, segment):
+    offset, length = segment
+    spool.seek(offset)
+    return spool.read(length)
+
+def _report_item_key(item):
+    return (item.get('port'), item.get('pluginID'))
+
+class NessusReport(SlottedModel):
+    __slots__ = ['name', 'hosts']
+
     def __init__(self):
         self.name=''
         self.hosts=[]
 
-class NessusReportHost(object):
+class NessusReportHost(SlottedModel):
+    __slots__ = ['name', 'host_ip', 'scan_start', 'scan_end', 'host_fqdn', 'netbios_name', 'mac_address',
+                 'operating_system', 'os', 'report_items']
+
     def __init__(self):
         self.name=''
         self.host_ip=''
@@ -201,16 +575,35 @@ class NessusReportHost(object):
         self.os=''
         self.report_items=[]
         
-class NessusReportItem(object):
+class NessusPlugin(SlottedModel):
+    '''
+    Plugin level (static) metadata - description, solution, CVE list, CVSS data, etc.
+
+    NessusParser keeps one of these per pluginID in its plugins catalog and every
+    NessusReportItem raised by that plugin references it, so a plugin firing on
+    thousands of hosts stores its text once. Note that list values (cve, bid, etc.)
+    are shared too; assign a new list rather than modifying one in place.
+
+    ITEM_FIELDS may legitimately differ between items of one plugin - compliance
+    plugins describe each individual check there - so they are left out when items
+    are matched to the catalog entry, and an item keeps its own value when it differs.
+    '''
+    FIELDS = ['plugin_name','plugin_family','agent','bid','cert','cpe','cve','cvss_base_score','cvss_vector',
+              'cvss_temporal_score','cvss_temporal_vector','cvss3_base_score','cvss3_vector','cvss3_temporal_score',
+              'cvss3_temporal_vector','cvss_score_source','description','exploit_available','exploit_code_maturity',
+              'exploit_framework_canvas','exploit_framework_core','exploit_framework_metasploit','exploitability_ease',
+              'exploited_by_malware','fname','iava','msft','metasploit_name','osvdb','patch_publication_date',
+              'plugin_modification_date','plugin_type','risk_factor','script_version','see_also','solution',
+              'stig_severity','synopsis','vuln_publication_date','xref']
+    ITEM_FIELDS = ['description','see_also','solution']
+
+    __slots__ = ['shared'] + FIELDS
+
     def __init__(self):
-        self.plugin_id=''
+        self.shared=False       #True once stored in a parser catalog; items copy before modifying
+
         self.plugin_name=''
         self.plugin_family=''
-        self.port=''
-        self.protocol=''
-        self.svc_name=''
-        self.severity=0
-        
         self.agent=''
         self.bid=[]
         self.cert=''
@@ -239,7 +632,6 @@ class NessusReportItem(object):
         self.metasploit_name=''
         self.osvdb=[]
         self.patch_publication_date=''
-        #SKIP plugin_name since defined in host attribute section above
         self.plugin_modification_date=''
         self.plugin_type=''
         self.risk_factor=''
@@ -250,16 +642,217 @@ class NessusReportItem(object):
         self.synopsis=''
         self.vuln_publication_date=''
         self.xref=[]
+
+    def values(self):
+        # the metadata compared when matching items to a catalog entry
+        return tuple(getattr(self, field) for field in self.SHARED_FIELDS)
+
+    def copy(self):
+        plugin = NessusPlugin()
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if isinstance(value, list):
+                value = list(value)
+            setattr(plugin, field, value)
+        return plugin
+
+NessusPlugin.SHARED_FIELDS = [field for field in NessusPlugin.FIELDS if field not in NessusPlugin.ITEM_FIELDS]
+
+class PluginAttribute(object):
+    '''
+    Descriptor exposing a NessusPlugin field as an attribute of NessusReportItem (or the
+    item's own value of an ITEM_FIELDS field); assigning to it on an item that shares a
+    catalog plugin gives that item its own copy
+    '''
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, item, owner):
+        if item is None:
+            return self
+        if item.item_fields is not None and self.name in item.item_fields:
+            return item.item_fields[self.name]
+        return getattr(item.plugin, self.name)
+
+    def __set__(self, item, value):
+        if item.item_fields is not None and self.name in item.item_fields:
+            item.item_fields[self.name] = value
+            return
+        if item.plugin.shared:
+            item.plugin = item.plugin.copy()
+        setattr(item.plugin, self.name, value)
+
+class NessusReportItem(SlottedModel):
+    '''
+    A single finding on a host; plugin level fields (description, solution, cve, etc.)
+    are read from the referenced NessusPlugin, except for the NessusPlugin.ITEM_FIELDS
+    in which this item differs from it (kept in item_fields)
+    '''
+    __slots__ = ['plugin', 'item_fields', 'plugin_id', 'port', 'protocol', 'svc_name', 'severity', 'plugin_output',
+                 'compliance', 'compliance_check_name', 'compliance_result', 'compliance_policy_value',
+                 'compliance_actual_value']
+
+    def __init__(self):
+        self.plugin=NessusPlugin()
+        self.item_fields=None   #{field: value} for the ITEM_FIELDS which differ from plugin
+        self.plugin_id=''
+        self.port=''
+        self.protocol=''
+        self.svc_name=''
+        self.severity=0
         self.plugin_output=''
+
+        # Compliance check results (audit scans) - these differ per host, so live on the item.
+        # compliance_result stays None when the item has no cm:compliance-result element
+        self.compliance=''
+        self.compliance_check_name=''
+        self.compliance_result=None
+        self.compliance_policy_value=''
+        self.compliance_actual_value=''
+
+    def use_plugin(self, plugin):
+        '''
+        Points the item at plugin (normally a catalog entry), keeping the values of any
+        ITEM_FIELDS in which it differs from plugin on the item itself
+        '''
+        values = [(field, getattr(self, field)) for field in NessusPlugin.ITEM_FIELDS]
+        self.plugin = plugin
+        self.item_fields = dict((field, value) for field, value in values if value != getattr(plugin, field)) or None
+
+for field in NessusPlugin.FIELDS:
+    setattr(NessusReportItem, field, PluginAttribute(field))
+del field
         
+# Report item child nodes to be extracted are enumerated in the following arrays;
+# REPORT_ITEM_TEXT_NODES contains all unique nodes
+# REPORT_ITEM_ARRAY_NODES contains nodes in which multiple instances can be found; these are returned as a list
+REPORT_ITEM_TEXT_NODES=['agent','cert','cpe','cvss_base_score','cvss_vector','cvss_temporal_score','cvss_temporal_vector',
+                        'cvss3_base_score','cvss3_vector','cvss3_temporal_score','cvss3_temporal_vector', 'cvss_score_source',
+                        'description', 'exploit_available', 'exploit_code_maturity', 'exploit_framework_core', 'exploit_framework_canvas',
+                        'exploit_framework_metasploit','exploitability_ease', 'exploited_by_malware', 'metasploit_name', 
+                        'patch_publication_date','plugin_modification_date','plugin_type', 'risk_factor','script_version',
+                        'see_also','solution','stig_severity','synopsis','vuln_publication_date','plugin_output']
+
+REPORT_ITEM_ARRAY_NODES=['bid','cve','iava','msft','osvdb','xref']
+
+# Per item compliance check nodes (mostly in the cm: namespace) and the item attribute each is stored in
+REPORT_ITEM_COMPLIANCE_NODES={'compliance': 'compliance',
+                              '{http://www.nessus.org/cm}compliance-check-name': 'compliance_check_name',
+                              '{http://www.nessus.org/cm}compliance-result': 'compliance_result',
+                              '{http://www.nessus.org/cm}compliance-policy-value': 'compliance_policy_value',
+                              '{http://www.nessus.org/cm}compliance-actual-value': 'compliance_actual_value'}
+
+# Bump whenever a change to the parsing code alters the results for the same input
+PARSER_VERSION = 3
+
+# Parsed reports in a ParseCache are only reused while the parser version and model
+# layout are unchanged
+CACHE_VERSION = model_signature(PARSER_VERSION, NessusReport, NessusReportHost, NessusPlugin, NessusReportItem)
+
+# Precomputed tag -> node type lookup used when walking ReportItem children
+TEXT_NODE, VECTOR_NODE, ARRAY_NODE, COMPLIANCE_NODE = range(4)
+REPORT_ITEM_NODES = dict((node, VECTOR_NODE if 'cvss' in node and 'vector' in node else TEXT_NODE) for node in REPORT_ITEM_TEXT_NODES)
+REPORT_ITEM_NODES.update((node, ARRAY_NODE) for node in REPORT_ITEM_ARRAY_NODES)
+REPORT_ITEM_NODES.update((node, COMPLIANCE_NODE) for node in REPORT_ITEM_COMPLIANCE_NODES)
+
+# Columns of the findings table built by NessusParser.iter_record_batches(), one row per
+# ReportItem; LABEL columns (values repeating across rows) are dictionary encoded
+FINDINGS_COLUMNS = [('host', 'label'), ('ip', 'label'), ('fqdn', 'label'), ('port', 'int32'),
+                    ('protocol', 'label'), ('svc_name', 'label'), ('plugin_id', 'int32'),
+                    ('plugin_name', 'label'), ('plugin_family', 'label'), ('severity', 'int8'),
+                    ('risk_factor', 'label'), ('cvss_base_score', 'float32'), ('cvss_vector', 'label'),
+                    ('cvss_temporal_score', 'float32'), ('cvss3_base_score', 'float32'),
+                    ('cvss3_vector', 'label'), ('cvss3_temporal_score', 'float32'),
+                    ('exploit_available', 'label'), ('cve', 'list'), ('synopsis', 'label'),
+                    ('solution', 'label'), ('plugin_output', 'string')]
+
+# Rows per record batch / Parquet row group
+FINDINGS_BATCH_ROWS = 65536
+
+def findings_schema():
+    '''
+    pyarrow schema of the FINDINGS_COLUMNS table
+    '''
+    if pa is None:
+        raise ImportError("pyarrow module not found; try pip install pyarrow")
+
+    types = {'label': pa.dictionary(pa.int32(), pa.string()), 'string': pa.string(), 'int8': pa.int8(),
+             'int32': pa.int32(), 'float32': pa.float32(), 'list': pa.list_(pa.string())}
+    return pa.schema([(name, types[kind]) for name, kind in FINDINGS_COLUMNS])
+
+def _finding_row(host, item):
+    '''
+    One FINDINGS_COLUMNS row for a NessusReportItem
+    '''
+    plugin = item.plugin
+    return (host.name, host.host_ip, host.host_fqdn, _int_value(item.port), item.protocol, item.svc_name,
+            _int_value(item.plugin_id), plugin.plugin_name, plugin.plugin_family, item.severity,
+            plugin.risk_factor, _float_value(plugin.cvss_base_score), plugin.cvss_vector,
+            _float_value(plugin.cvss_temporal_score), _float_value(plugin.cvss3_base_score), plugin.cvss3_vector,
+            _float_value(plugin.cvss3_temporal_score), plugin.exploit_available, plugin.cve, plugin.synopsis,
+            item.solution, item.plugin_output)
+
+def _int_value(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _float_value(value):
+    # Scores read from the file are text, so a real '0.0' is kept; an empty node or
+    # one that was missing (the model default, float 0.0, left in place) is stored as null
+    if value is None or value == '' or (not isinstance(value, str) and value == 0.0):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _score_value(value):
+    score = _float_value(value)
+    return float('nan') if score is None else score
+
 class NessusParser(object):
-    def __init__(self, filename_xml='', xml=''):
+    '''
+    Parses .nessus files (or raw xml) into NessusReport objects
+
+    By default every file is parsed up front into self.reports. Pass stream=True to
+    skip that and pull hosts one at a time from iter_hosts() instead; only the host
+    currently being parsed is held in memory, so multi-GB files can be processed.
+
+    Cleaned up description / solution / synopsis text is memoized per plugin ID
+    unless text_cache=False is passed.
+
+    Plugin level metadata is stored once per pluginID in self.plugins and shared by
+    every NessusReportItem raised by that plugin.
+
+    filename_xml may be a single .nessus file, a directory or a list of files; with
+    workers > 1, multiple files are parsed in that many worker processes and the
+    reports are returned in input order. A single large file is instead split into
+    byte ranges on ReportHost boundaries which are parsed in the worker processes.
+
+    If cache_dir is given, the reports parsed from each file are kept in a ParseCache
+    there and reused as long as the file is unchanged.
+    '''
+    def __init__(self, filename_xml='', xml='', stream=False, text_cache=True, workers=1, cache_dir=''):
         self.reports=[]
+        self.plugins={}
+        self.workers=workers
+        self.cache_dir=cache_dir
+        self._text_cache = text_cache
+        self._normalizer = TextNormalizer(cache=text_cache)
+        self._xml_source = []
+        self._xml=''
  
         if filename_xml:
             # Parse input values in order to find valid .nessus files
-            self._xml_source = []
-            if os.path.isdir(filename_xml):
+            if isinstance(filename_xml, list):
+                for f in filename_xml:
+                    if not os.path.exists(f):
+                        print("[!] File specified '%s' not exist!" % f)
+                        exit(3)
+                self._xml_source.extend(filename_xml)
+            elif os.path.isdir(filename_xml):
                 if not filename_xml.endswith("/"):
                     filename_xml += "/"
                 # Automatic searching of files into specified directory
@@ -278,18 +871,139 @@ class NessusParser(object):
                 print("[!] No file .nessus to parse was found!")
                 exit(3)
             
-            # For each .nessus file found...
-            for report in self._xml_source:
-                # Parse and extract information
-                self._parse_results(report)
-                
+            if not stream:
+                self._parse_files()
+
         elif xml:
-            self._parse_results('', xml)
+            self._xml = xml
+            if not stream:
+                self._parse_results('', xml)
             
         else:
             print("[!] No xml data passed to parser!")
             exit(1)
 
+    def iter_hosts(self):
+        '''
+        Generator yielding fully populated NessusReportHost objects one at a time
+
+        Uses iterparse on ReportHost end events and frees each processed element (and
+        any siblings already handled) so peak memory is bounded by the largest single
+        host rather than the size of the file.
+        '''
+        if self._xml_source:
+            sources = self._xml_source
+        elif self._xml:
+            xml = self._xml
+            if isinstance(xml, str):
+                xml = xml.encode('utf-8')
+            sources = [BytesIO(xml)]
+        else:
+            sources = []
+
+        for source in sources:
+            for event, host in etree.iterparse(source, events=('end',), tag='ReportHost'):
+                nessus_report_host = self._parse_host(host)
+
+                # Free the processed element along with preceding siblings still hanging
+                # off the Report node so the tree never grows past the current host
+                host.clear()
+                while host.getprevious() is not None:
+                    del host.getparent()[0]
+
+                if nessus_report_host:
+                    yield nessus_report_host
+
+    def all_hosts(self):
+        '''
+        Iterates over the hosts of the parsed reports, or streams them from iter_hosts()
+        if the files were not parsed up front (stream=True)
+        '''
+        if self.reports:
+            return (host for report in self.reports for host in report.hosts)
+        return self.iter_hosts()
+
+    def iter_record_batches(self, batch_size=FINDINGS_BATCH_ROWS):
+        '''
+        Generator yielding the findings as pyarrow RecordBatches (see FINDINGS_COLUMNS)
+        of up to batch_size rows
+
+        Hosts come from all_hosts(); when they are streamed only the current batch of
+        rows is held in memory.
+        '''
+        schema = findings_schema()
+        rows = []
+        for host in self.all_hosts():
+            rows.extend(_finding_row(host, item) for item in host.report_items)
+            while len(rows) >= batch_size:
+                yield self._record_batch(schema, rows[:batch_size])
+                del rows[:batch_size]
+        if rows:
+            yield self._record_batch(schema, rows)
+
+    def write_parquet(self, outfile, batch_size=FINDINGS_BATCH_ROWS):
+        '''
+        Streams the findings to a Parquet file at outfile, one row group per record
+        batch; returns the number of rows written
+        '''
+        # findings_schema() raises the ImportError if pyarrow is not installed
+        schema = findings_schema()
+        rows = 0
+        writer = pq.ParquetWriter(outfile, schema)
+        try:
+            for batch in self.iter_record_batches(batch_size):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        finally:
+            writer.close()
+        return rows
+
+    @staticmethod
+    def _record_batch(schema, rows):
+        # transpose the rows into one array per column
+        columns = zip(*rows)
+        return pa.RecordBatch.from_arrays([pa.array(column, type=field.type)
+                                           for column, field in zip(columns, schema)], schema=schema)
+
+    def _parse_files(self):
+        cache = ParseCache(self.cache_dir) if self.cache_dir else None
+        try:
+            cached = {}
+            if cache:
+                for f in self._xml_source:
+                    reports = cache.get('nessus', f, CACHE_VERSION)
+                    if reports is not None:
+                        cached[f] = reports
+
+            pending = [f for f in self._xml_source if f not in cached]
+            parsed = {}
+            if self.workers > 1 and len(pending) > 1:
+                # Parse files in worker processes; results come back in input order
+                parsed = dict(zip(pending, parallel_map(_parse_nessus_file, [(f, self._text_cache) for f in pending],
+                                                        self.workers)))
+
+            # For each .nessus file found...
+            for f in self._xml_source:
+                if f in cached:
+                    self._add_reports(cached[f])
+                    continue
+
+                start = len(self.reports)
+                if f in parsed:
+                    self._add_reports(parsed[f])
+                elif self.workers > 1:
+                    # Single file - split it up between the worker processes
+                    self._parse_results_chunked(f)
+                else:
+                    # Parse and extract information
+                    self._parse_results(f)
+
+                if cache:
+                    cache.put('nessus', f, self.reports[start:], CACHE_VERSION)
+        finally:
+            if cache:
+                cache.close()
+
     def _parse_results(self, file_report='', xml_report=''):
         
         if file_report:
@@ -304,109 +1018,408 @@ class NessusParser(object):
             
             # For each host in report file, it extracts information
             for host in report.findall('ReportHost'):
-                nessus_report_host = NessusReportHost()
-                # Get IP address
-                nessus_report_host.name = host.get('name')
-                if nessus_report_host.name:
-                    hostprops = host.find("HostProperties").findall("tag")
-                    
-                    for prop in hostprops:
-                        if prop.get('name') == 'host-ip':
-                            nessus_report_host.host_ip = prop.text
-                            
-                        if prop.get('name') == 'HOST_START':
-                            nessus_report_host.scan_start = prop.text
-                            
-                        if prop.get('name') == 'HOST_END':
-                            nessus_report_host.scan_end = prop.text
-                            
-                        if prop.get('name') == 'operating-system':
-                            nessus_report_host.operating_system = prop.text
-                            
-                        if prop.get('name') == 'os':
-                            nessus_report_host.os = prop.text
-                            
-                        if prop.get('name') == 'host-fqdn':
-                            nessus_report_host.host_fqdn = prop.text
-                            
-                        if prop.get('name') == 'netbios-name':
-                            nessus_report_host.netbios_name = prop.text
-                            
-                        if prop.get('name') == 'mac-address':
-                            nessus_report_host.mac_address = prop.text
-                                
+                nessus_report_host = self._parse_host(host)
+                if nessus_report_host:
                     # Add information extracted to data structure
                     nessus_report.hosts.append(nessus_report_host)
-                    
-                    reportitems = host.findall("ReportItem")
-                    for item in reportitems:
-                        nessus_report_item = NessusReportItem()
-                        # Extract generic vulnerability information
-                        nessus_report_item.plugin_name = item.get('pluginName')
-                        nessus_report_item.plugin_id = item.get('pluginID')
-                        nessus_report_item.port = item.get('port')
-                        nessus_report_item.protocol = item.get('protocol')
-                        nessus_report_item.description = item.get('description')
-                        nessus_report_item.svc_name = item.get('svc_name')
-                        nessus_report_item.severity = int(item.get('severity'))
-
-                        
-
-                        # Report item child nodes to be extracted are enumerated in the following arrays;
-                        # text_nodes contains all unique nodes
-                        # array_nodes contains nodes in which multiple instances can be found; these are returned as a list
-                        text_nodes=['agent','cert','cpe','cvss_base_score','cvss_vector','cvss_temporal_score','cvss_temporal_vector',
-                                    'cvss3_base_score','cvss3_vector','cvss3_temporal_score','cvss3_temporal_vector', 'cvss_score_source',
-                                    'description', 'exploit_available', 'exploit_code_maturity', 'exploit_framework_core', 'exploit_framework_canvas',
-                                    'exploit_framework_metasploit','exploitability_ease', 'exploited_by_malware', 'metasploit_name', 
-                                    'patch_publication_date','plugin_modification_date','plugin_type', 'risk_factor','script_version',
-                                    'see_also','solution','stig_severity','synopsis','vuln_publication_date','plugin_output']
-                        
-                        array_nodes=['bid','cve','iava','msft','osvdb','xref']
-
-                        for node in text_nodes:
-                            if item.find(node) is not None:
-                                node_value = item.find(node).text
-
-                                # clean up CVSS vector data
-                                if 'cvss' in node and 'vector' in node:
-                                    node_value = node_value.replace('CVSS2#','')
-
-                                setattr(nessus_report_item,node,node_value)
-                                
-                        for node in array_nodes:
-                            if item.find(node) is not None:
-                                array=[]
-                                for hit in item.findall(node):
-                                    array.append(hit.text)
-                                setattr(nessus_report_item,node,array)
-                        
-                        #Cleanup some of the screwball formatting from Nessus
-                        nessus_report_item.plugin_name = nessus_report_item.plugin_name.replace(")-", ") - ")
-                        nessus_report_item.plugin_name = nessus_report_item.plugin_name.replace("s(", "s (")
-                        nessus_report_item.plugin_name = nessus_report_item.plugin_name.replace("e(", "e (")
-                        nessus_report_item.synopsis = nessus_report_item.synopsis.replace("\n  ", " ")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n  -", "\n•")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n -", "\n•")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n\n  ", "\n\n")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n\n ", "\n\n")
-                        nessus_report_item.description = nessus_report_item.description.replace("     ", " ")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n    ", " ")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n   ", " ")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n  ", " ")
-                        nessus_report_item.description = nessus_report_item.description.replace("\n ", " ")
-                        nessus_report_item.solution = nessus_report_item.solution.replace("\n  -", "\n•")
-                        nessus_report_item.solution = nessus_report_item.solution.replace("\n -", "\n•")
-                        nessus_report_item.solution = nessus_report_item.solution.replace("\n  ", " ")
-                        nessus_report_item.solution = nessus_report_item.solution.replace("\n ", " ")
-
-
-                        nessus_report_host.report_items.append(nessus_report_item)
-
-                        
         
         self.reports.append(nessus_report)
 
+    def _parse_results_chunked(self, file_report):
+        '''
+        Parses one .nessus file in worker processes by splitting it into byte ranges
+        aligned on ReportHost boundaries; falls back to a normal parse for small files,
+        files with more than one Report, or if any chunk fails to parse
+        '''
+        chunks = split_report_hosts(file_report, self.workers * 2)
+        if chunks:
+            report_name, ranges = chunks
+            results = parallel_map(_parse_nessus_chunk, [(file_report, start, end, self._text_cache) for start, end in ranges],
+                                   self.workers)
+
+            if None not in results:
+                nessus_report = NessusReport()
+                nessus_report.name = report_name
+                for hosts in results:
+                    nessus_report.hosts.extend(hosts)
+                self._add_reports([nessus_report])
+                return
+
+        self._parse_results(file_report)
+
+    def _parse_host(self, host):
+        '''
+        Builds a NessusReportHost (and its report items) from a ReportHost element;
+        returns None if the host has no name
+        '''
+        nessus_report_host = NessusReportHost()
+        # Get IP address
+        nessus_report_host.name = host.get('name')
+        if not nessus_report_host.name:
+            return None
+
+        hostprops = host.find("HostProperties").findall("tag")
+        
+        for prop in hostprops:
+            if prop.get('name') == 'host-ip':
+                nessus_report_host.host_ip = prop.text
+                
+            if prop.get('name') == 'HOST_START':
+                nessus_report_host.scan_start = prop.text
+                
+            if prop.get('name') == 'HOST_END':
+                nessus_report_host.scan_end = prop.text
+                
+            if prop.get('name') == 'operating-system':
+                nessus_report_host.operating_system = prop.text
+                
+            if prop.get('name') == 'os':
+                nessus_report_host.os = prop.text
+                
+            if prop.get('name') == 'host-fqdn':
+                nessus_report_host.host_fqdn = prop.text
+                
+            if prop.get('name') == 'netbios-name':
+                nessus_report_host.netbios_name = prop.text
+                
+            if prop.get('name') == 'mac-address':
+                nessus_report_host.mac_address = prop.text
+        
+        reportitems = host.findall("ReportItem")
+        for item in reportitems:
+            nessus_report_host.report_items.append(self._parse_item(item))
+
+        return nessus_report_host
+
+    def _parse_item(self, item):
+        '''
+        Builds a NessusReportItem from a ReportItem element
+        '''
+        nessus_report_item = NessusReportItem()
+        # Extract generic vulnerability information
+        nessus_report_item.plugin_name = item.get('pluginName')
+        nessus_report_item.plugin_family = item.get('pluginFamily', '')
+        nessus_report_item.plugin_id = item.get('pluginID')
+        nessus_report_item.port = item.get('port')
+        nessus_report_item.protocol = item.get('protocol')
+        nessus_report_item.description = item.get('description')
+        nessus_report_item.svc_name = item.get('svc_name')
+        nessus_report_item.severity = int(item.get('severity'))
+
+        
+
+        # Walk the item's children once, dispatching on tag via the REPORT_ITEM_NODES table
+        # rather than searching the subtree separately for every node name we know about
+        seen = set()
+        arrays = {}
+        for child in item:
+            node = child.tag
+            node_type = REPORT_ITEM_NODES.get(node)
+
+            if node_type == ARRAY_NODE:
+                arrays.setdefault(node, []).append(child.text)
+
+            elif node_type is not None and node not in seen:
+                # only the first instance of a text node is used
+                seen.add(node)
+                node_value = child.text
+
+                # clean up CVSS vector data
+                if node_type == VECTOR_NODE:
+                    node_value = node_value.replace('CVSS2#','')
+                elif node_type == COMPLIANCE_NODE:
+                    node = REPORT_ITEM_COMPLIANCE_NODES[node]
+                    node_value = node_value or ''
+
+                setattr(nessus_report_item,node,node_value)
+
+        for node, array in arrays.items():
+            setattr(nessus_report_item,node,array)
+        
+        #Cleanup some of the screwball formatting from Nessus
+        normalize = self._normalizer.normalize
+        plugin_id = nessus_report_item.plugin_id
+        nessus_report_item.plugin_name = normalize(normalize_name, nessus_report_item.plugin_name, plugin_id)
+        nessus_report_item.synopsis = normalize(normalize_synopsis, nessus_report_item.synopsis, plugin_id)
+        nessus_report_item.description = normalize(normalize_paragraph, nessus_report_item.description, plugin_id)
+        nessus_report_item.solution = normalize(normalize_solution, nessus_report_item.solution, plugin_id)
+
+        nessus_report_item.use_plugin(self._catalog_plugin(plugin_id, nessus_report_item.plugin))
+
+        return nessus_report_item
+
+    def _add_reports(self, reports):
+        '''
+        Adds reports parsed by another NessusParser (e.g. in a worker process), moving
+        their items over to this parser's plugin catalog
+        '''
+        adopted = {}
+        for report in reports:
+            for host in report.hosts:
+                for item in host.report_items:
+                    plugin = adopted.get(item.plugin)
+                    if plugin is None:
+                        plugin = adopted[item.plugin] = self._catalog_plugin(item.plugin_id, item.plugin)
+                    if plugin is not item.plugin:
+                        item.use_plugin(plugin)
+            self.reports.append(report)
+
+    def _catalog_plugin(self, plugin_id, plugin):
+        '''
+        Returns the catalog entry for plugin_id if it holds the same metadata as plugin
+        (apart from the ITEM_FIELDS, which items keep themselves where they differ);
+        otherwise (new plugin, or a different plugin version across scans) stores plugin
+        as the catalog entry and returns it
+        '''
+        existing = self.plugins.get(plugin_id)
+        if existing is not None and existing.values() == plugin.values():
+            return existing
+
+        plugin.shared = True
+        self.plugins[plugin_id] = plugin
+        return plugin
+
+
+# Files are only split when every chunk would be at least this size
+MIN_CHUNK_BYTES = 16 * 1024 * 1024
+
+def split_report_hosts(file_report, parts):
+    '''
+    Splits a .nessus file into up to parts byte ranges for parallel parsing
+
+    Boundaries are found by searching an mmap of the file for "<ReportHost" near
+    evenly spaced offsets, so the scan only touches a few pages per boundary.
+    Returns (report name, [(start, end), ...]) or None if the file should be parsed
+    as a whole (too small, or not exactly one Report).
+    '''
+    with open(file_report, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        parts = min(parts, size // MIN_CHUNK_BYTES)
+        if parts < 2:
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            first_host = _find_report_host(mm, 0)
+            hosts_end = mm.rfind(b'</Report>')
+            if first_host < 0 or hosts_end < first_host or mm.find(b'</Report>', first_host) != hosts_end:
+                return None
+
+            header = mm[:first_host]
+            footer = mm[hosts_end:]
+
+            bounds = [first_host]
+            for i in range(1, parts):
+                bound = _find_report_host(mm, first_host + (hosts_end - first_host) * i // parts)
+                if bound < 0 or bound >= hosts_end:
+                    break
+                if bound > bounds[-1]:
+                    bounds.append(bound)
+            bounds.append(hosts_end)
+
+    report = etree.fromstring(header + footer).find('Report')
+    if report is None:
+        return None
+
+    return report.get('name'), list(zip(bounds[:-1], bounds[1:]))
+
+def _find_report_host(mm, start):
+    '''
+    Offset of the next <ReportHost start tag at or after start, or -1
+    '''
+    pos = mm.find(b'<ReportHost', start)
+    while pos >= 0 and mm[pos+11:pos+12] not in (b' ', b'>', b'\t', b'\n', b'\r'):
+        pos = mm.find(b'<ReportHost', pos + 1)
+    return pos
+
+def _parse_nessus_chunk(args):
+    '''
+    Worker process entry point - parses the ReportHosts in one byte range of a .nessus
+    file; the range is wrapped in the file's own header / footer so that namespaces
+    and encoding are declared as usual. Returns None if the chunk does not parse.
+    '''
+    file_report, start, end, text_cache = args
+    with open(file_report, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            first_host = _find_report_host(mm, 0)
+            xml = mm[:first_host] + mm[start:end] + mm[mm.rfind(b'</Report>'):]
+
+    try:
+        return list(NessusParser(xml=xml, stream=True, text_cache=text_cache).iter_hosts())
+    except etree.XMLSyntaxError:
+        return None
+
+def _parse_nessus_file(args):
+    '''
+    Worker process entry point - parses a single .nessus file and returns its reports
+    '''
+    filename_xml, text_cache = args
+    return NessusParser([filename_xml], text_cache=text_cache).reports
+
+
+class NessusFindingsTable(object):
+    '''
+    The findings of a NessusParser as typed NumPy columns (one row per ReportItem) for
+    vectorized analytics - severity histograms, per host risk scores, top-N, etc.
+
+    Numeric columns are plugin_id, port (int32), severity (int8) and the CVSS scores
+    (float32, NaN where the plugin has none). The host and plugin_name columns are
+    dictionary encoded: int32 codes into the lists in self.labels.
+
+    Boolean masks built from the columns select rows with filter(), e.g.
+        table.filter((table.severity >= 3) & (table.port == 445))
+    '''
+    NUMERIC_COLUMNS = [('plugin_id', 'int32'), ('port', 'int32'), ('severity', 'int8'),
+                       ('cvss_base_score', 'float32'), ('cvss_temporal_score', 'float32'),
+                       ('cvss3_base_score', 'float32'), ('cvss3_temporal_score', 'float32')]
+    LABEL_COLUMNS = ['host', 'plugin_name']
+    SEVERITIES = 5
+
+    def __init__(self, parser=None, batch_size=FINDINGS_BATCH_ROWS):
+        if np is None:
+            raise ImportError("numpy module not found; try pip install numpy")
+
+        self.labels = dict((name, []) for name in self.LABEL_COLUMNS)
+        dtypes = [dtype for name, dtype in self.NUMERIC_COLUMNS] + ['int32'] * len(self.LABEL_COLUMNS)
+        chunks = [[] for dtype in dtypes]
+
+        if parser is not None:
+            # Rows are converted to arrays every batch_size rows so that the Python
+            # objects for only one batch are alive at a time
+            codes = dict((name, {}) for name in self.LABEL_COLUMNS)
+            rows = []
+            for host in parser.all_hosts():
+                host_code = self._label_code(codes['host'], host.name, 'host')
+                for item in host.report_items:
+                    plugin = item.plugin
+                    rows.append((_int_value(item.plugin_id) or 0, _int_value(item.port) or 0, item.severity,
+                                 _score_value(plugin.cvss_base_score), _score_value(plugin.cvss_temporal_score),
+                                 _score_value(plugin.cvss3_base_score), _score_value(plugin.cvss3_temporal_score),
+                                 host_code, self._label_code(codes['plugin_name'], plugin.plugin_name, 'plugin_name')))
+                if len(rows) >= batch_size:
+                    self._add_chunk(chunks, dtypes, rows)
+                    rows = []
+            if rows:
+                self._add_chunk(chunks, dtypes, rows)
+
+        names = [name for name, dtype in self.NUMERIC_COLUMNS] + self.LABEL_COLUMNS
+        for name, dtype, chunk in zip(names, dtypes, chunks):
+            setattr(self, name, np.concatenate(chunk) if chunk else np.empty(0, dtype=dtype))
+
+    def _label_code(self, codes, value, column):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.labels[column])
+            self.labels[column].append(value)
+        return code
+
+    @staticmethod
+    def _add_chunk(chunks, dtypes, rows):
+        for chunk, dtype, column in zip(chunks, dtypes, zip(*rows)):
+            chunk.append(np.array(column, dtype=dtype))
+
+    def __len__(self):
+        return len(self.severity)
+
+    def filter(self, mask):
+        '''
+        New table holding the rows selected by mask (boolean array or indexes); the
+        label lists are shared with this table
+        '''
+        table = NessusFindingsTable()
+        table.labels = self.labels
+        for name in [name for name, dtype in self.NUMERIC_COLUMNS] + self.LABEL_COLUMNS:
+            setattr(table, name, getattr(self, name)[mask])
+        return table
+
+    def base_scores(self):
+        '''
+        Best available base score per row - CVSS v3 where present, else CVSS v2
+        '''
+        return np.where(np.isnan(self.cvss3_base_score), self.cvss_base_score, self.cvss3_base_score)
+
+    def group_by(self, key, column=None, how='count'):
+        '''
+        Aggregates column (a column name or an array with one value per row) per distinct
+        value of key (a label or numeric column); how is count, sum, mean, min or max and
+        NaN values are skipped. Without a column, rows are counted.
+
+        Returns (keys, values) arrays; for label columns keys holds every label, including
+        any no longer present after filter() (count 0 / NaN).
+        '''
+        codes, keys = self._group_codes(key)
+        groups = len(keys)
+        if column is None:
+            return keys, np.bincount(codes, minlength=groups)
+
+        values = getattr(self, column) if isinstance(column, str) else column
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+
+        if how == 'count':
+            result = np.bincount(codes, minlength=groups)
+        elif how in ('sum', 'mean'):
+            result = np.bincount(codes, weights=values, minlength=groups)
+            if how == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result = result / np.bincount(codes, minlength=groups)
+        elif how in ('min', 'max'):
+            result = np.full(groups, np.nan)
+            (np.fmin if how == 'min' else np.fmax).at(result, codes, values)
+        else:
+            raise ValueError("unknown aggregation '%s'" % how)
+        return keys, result
+
+    def top_n(self, n, key, column=None, how='count'):
+        '''
+        The n largest group_by() results as a list of (key, value), largest first
+        '''
+        keys, values = self.group_by(key, column, how)
+        values = np.nan_to_num(values.astype(np.float64), nan=-np.inf)
+        top = np.argsort(-values, kind='stable')[:max(n, 0)]
+        return list(zip(keys[top].tolist(), values[top].tolist()))
+
+    def severity_histogram(self, by=None):
+        '''
+        Number of findings per severity (0 - 4); with by (a label or numeric column)
+        returns (keys, counts) with one row of counts per key
+        '''
+        if by is None:
+            return np.bincount(self.severity, minlength=self.SEVERITIES)
+
+        codes, keys = self._group_codes(by)
+        cells = codes.astype(np.int64) * self.SEVERITIES + self.severity
+        counts = np.bincount(cells, minlength=len(keys) * self.SEVERITIES)
+        return keys, counts.reshape(len(keys), self.SEVERITIES)
+
+    def risk_scores(self, by='host'):
+        '''
+        Sum of the best available CVSS base score (see base_scores) per host (or other
+        key); returns (keys, scores)
+        '''
+        return self.group_by(by, self.base_scores(), 'sum')
+
+    def _group_codes(self, key):
+        '''
+        Returns (codes, keys) - the group number of every row and the key of each group
+        '''
+        if key in self.labels:
+            return getattr(self, key), np.array(self.labels[key], dtype=object)
+
+        column = getattr(self, key)
+        if (not len(column) or column.dtype.kind not in 'iu'
+                or int(column.max()) - int(column.min()) > max(len(column), 1 << 20)):
+            keys, codes = np.unique(column, return_inverse=True)
+            return codes, keys
+
+        # Integer keys (plugin IDs, ports) span a small range - bin them directly rather
+        # than sorting every row, then number the bins that are in use
+        low = int(column.min())
+        offsets = column.astype(np.int64) - low
+        present = np.bincount(offsets) > 0
+        numbers = np.cumsum(present) - 1
+        return numbers[offsets], np.flatnonzero(present) + low
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -12,7 +12,12 @@ See README.md for licensing information and credits
 
 '''
 import argparse
+import json
 import os
+import socket
+import time
+from functools import lru_cache
+from io import BytesIO
 
 try:
     from lxml import etree
@@ -21,6 +26,11 @@ except:
     print("pip install lxml")
     print("     ----- OR -----")
     print("apt-get install python-lxml")
+
+try:
+    from .parser_utils import ParseCache, SlottedModel, compiled_transform, ip_sort_key, model_signature, parallel_map
+except ImportError:
+    from parser_utils import ParseCache, SlottedModel, compiled_transform, ip_sort_key, model_signature, parallel_map
     
 
 def main():
@@ -59,6 +69,19 @@ def main():
                         help='Parse nessus output files and export host and service data to greppable output',
                         action='store_true'
     )
+    parser.add_argument('-j', '--jobs', action='store', type=int, default=1,
+                        help='Number of worker processes used to parse / transform multiple files (default 1)'
+    )
+    parser.add_argument('-w', '--watch',
+                        help='Keep running and update the parsed output (-p) as nmap files are added or changed',
+                        action='store_true'
+    )
+    parser.add_argument('--interval', action='store', type=int, default=60,
+                        help='Seconds between directory scans in watch mode (default 60)'
+    )
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='Do not read or update the parse cache kept in the output directory'
+    )
     args = parser.parse_args()
     
     target = args.nmap_input
@@ -68,6 +91,14 @@ def main():
     is_html = args.html
     is_merge = args.merge
     is_parse = args.parse
+    jobs = args.jobs
+    use_cache = args.cache
+    is_watch = args.watch
+    interval = args.interval
+
+    # watch mode only makes sense for the parsed output
+    if is_watch:
+        is_parse = True
     
     #------------------------------------------------------------------------------
     # Main stuff
@@ -91,65 +122,17 @@ def main():
     
     parser = None
 
-    if is_parse:
-        parser = NmapParser(target)
-        parser.parse()
-
-        host_list = []
-        service_array = {}
-
-        for report in parser.reports:
-
-            for host in report.hosts:
-                host_list.append(host.addr_ipv4)
-
-                
-                excluded_services = ['unknown', 'tcpwrapped']
-                excluded_version_text = ['Microsoft HTTPAPI']
-
-                for port in host.ports:
-                    exclude = False
+    if is_watch:
+        # Keeps running until interrupted; rewrites parsed/ as new scans show up
+        watch_parsed_output(target, outdir, jobs, outdir if use_cache else '', interval)
 
-                    if port.svc_name in excluded_services:
-                        exclude = True
-
-                    for text in excluded_version_text:
-                        try:
-                            if text in port.svc_version:
-                                exclude = True
-                        except:
-                            pass
-
-                    if (port.state == 'open') and not exclude:
-
-                        if 'http' in port.svc_name:
-                            service_name = 'http'
-                        else:
-                            service_name = port.svc_name
-
-                        service_array.setdefault((service_name, port.portid, port.protocol),[]).append(host.addr_ipv4)
-
-        if not os.path.exists(os.path.join(outdir, 'parsed')):
-            os.mkdir(os.path.join(outdir, 'parsed'))
-
-        if not os.path.exists(os.path.join(outdir, 'parsed', 'services')):
-            os.mkdir(os.path.join(outdir, 'parsed', 'services'))
-
-        output = ''
-        for host in host_list:
-            output += host + "\n"
-
-        output_file(os.path.join(outdir, 'parsed', 'hosts.txt'), bytes(output,'utf-8'))
-
-
-        for service,hosts in service_array.items():
-            output=''
-            filename = service[0] + '-' + service[1] + '-' + service[2] + '.txt'
-
-            for host in hosts:
-                output += host + "\n"
+    elif is_parse:
+        parser = NmapParser(target, workers=jobs, cache_dir=outdir if use_cache else '',
+                            port_states=['open'], exclude_services=EXCLUDED_SERVICES)
+        parser.parse()
 
-            output_file(os.path.join(outdir, 'parsed', 'services', filename), bytes(output,'utf-8'))
+        host_list, service_array = parsed_services(parser.reports)
+        write_parsed_output(outdir, host_list, service_array)
             
 
     if is_merge:
@@ -175,12 +158,16 @@ def main():
             if os.path.isfile(os.path.join(target,infile)) and infile[-3:] == "xml":
                 infile_list.append(os.path.join(target,infile))
     
+    html_jobs = []
     for infile in infile_list:
         outfile_base = os.path.join(outdir,os.path.splitext(os.path.basename(infile))[0])
         if is_text:
             nmap_out_to_txt(infile,outfile_base+'.txt')
         if is_html:
-            nmap_out_to_html(infile,outfile_base+'.html',xsl)
+            html_jobs.append((infile,outfile_base+'.html',xsl))
+
+    # The stylesheet is compiled once per (worker) process and reused for every file
+    parallel_map(_nmap_out_to_html, html_jobs, jobs)
             
     print("\n\nComplete!")
     print("Output data located at " + outdir)
@@ -192,33 +179,27 @@ def nmap_out_to_html(infile, outfile, xsl=''):
     
     output = ''
     dom = etree.parse(infile)
-    xslt = None
     
     try:
+        if not xsl:
+            # XSL file not specified - lets try some default locations
+            xsl = default_nmap_xsl()
+
         if xsl:
-            xslt = etree.parse(xsl)
+            transform = compiled_transform(xsl)
         else:
-            # XSL file not specified - lets try some default locations
-            paths=[]
-            paths.append(os.path.join('/', 'usr', 'share', 'nmap', 'nmap.xsl'))
-            paths.append(os.path.join('/', 'usr', 'local', 'share', 'nmap', 'nmap.xsl'))
-            paths.append(os.path.join('/', 'opt', 'homebrew', 'share', 'nmap', 'nmap.xsl'))
-
-            for path in paths:
-                if os.path.exists(path):
-                    #print('XSL file found at '+path)
-                    xslt = etree.parse(path)
-                    break
-            
             # still don't have XSL transform; lets try the path specified in the XML file
-            if not xslt:
-                docroot = dom.getroot()
-                pi = docroot.getprevious()
-                if isinstance(pi,etree._XSLTProcessingInstruction):
-                    xsl = pi.attrib['href']
-                    xslt = pi.parseXSL()
-        
-        transform = etree.XSLT(xslt)
+            docroot = dom.getroot()
+            pi = docroot.getprevious()
+            if not isinstance(pi,etree._XSLTProcessingInstruction):
+                raise ValueError('no XSL stylesheet found')
+
+            xsl = pi.attrib['href']
+            if xsl.startswith('file://') and os.path.exists(xsl[7:]):
+                transform = compiled_transform(xsl[7:])
+            else:
+                transform = etree.XSLT(pi.parseXSL())
+
         output = etree.tostring(transform(dom), pretty_print=True)
         
         output_file(outfile,output)
@@ -229,17 +210,280 @@ def nmap_out_to_html(infile, outfile, xsl=''):
         print(' -  make sure that the XSL transform is present and valid:')
         print(' -  ' + xsl)
         print(str(e))
+
+@lru_cache(maxsize=None)
+def default_nmap_xsl():
+    '''
+    Path of the nmap.xsl shipped with nmap, if found in one of the usual locations
+    (probed once per process)
+    '''
+    paths=[]
+    paths.append(os.path.join('/', 'usr', 'share', 'nmap', 'nmap.xsl'))
+    paths.append(os.path.join('/', 'usr', 'local', 'share', 'nmap', 'nmap.xsl'))
+    paths.append(os.path.join('/', 'opt', 'homebrew', 'share', 'nmap', 'nmap.xsl'))
+
+    for path in paths:
+        if os.path.exists(path):
+            #print('XSL file found at '+path)
+            return path
+    return ''
+
+def _nmap_out_to_html(args):
+    '''
+    Worker process entry point for nmap_out_to_html
+    '''
+    nmap_out_to_html(*args)
     
 def nmap_out_to_txt(infile, outfile):
-    output = ''
+    '''
+    accepts an nmap xml file and exports the text of its <output> elements
 
-    e = etree.parse(infile).getroot()
-    
-    for child in e.iter('output'):
-        output += child.text
-    
-    output_file(outfile, bytes(output,'utf-8'))
+    The file is streamed with iterparse and the text written out as it is found, so
+    the full document is never held in memory
+    '''
+    with open(outfile, 'w', encoding='utf-8', newline='', buffering=1024 * 1024) as f:
+        for event, elem in etree.iterparse(infile, events=('end',), tag=('output', 'host')):
+            if elem.tag == 'output' and elem.text:
+                f.write(elem.text)
+
+            # Free each handled element along with anything before it in the file
+            elem.clear()
+            if elem.getparent() is not None:
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
     
+# Ports left out of the -p service lists
+EXCLUDED_SERVICES = ['unknown', 'tcpwrapped']
+EXCLUDED_VERSION_TEXT = ['Microsoft HTTPAPI']
+
+def parsed_services(reports):
+    '''
+    Returns the host list and {(service, port, protocol): [hosts]} for the -p export
+    '''
+    host_list = []
+    service_array = {}
+
+    excluded_services = EXCLUDED_SERVICES
+    excluded_version_text = EXCLUDED_VERSION_TEXT
+
+    for report in reports:
+
+        for host in report.hosts:
+            host_list.append(host.addr_ipv4)
+
+            for port in host.ports:
+                exclude = False
+
+                if port.svc_name in excluded_services:
+                    exclude = True
+
+                for text in excluded_version_text:
+                    try:
+                        if text in port.svc_version:
+                            exclude = True
+                    except:
+                        pass
+
+                if (port.state == 'open') and not exclude:
+
+                    if 'http' in port.svc_name:
+                        service_name = 'http'
+                    else:
+                        service_name = port.svc_name
+
+                    service_array.setdefault((service_name, port.portid, port.protocol),[]).append(host.addr_ipv4)
+
+    return host_list, service_array
+
+def write_parsed_output(outdir, host_list, service_array, services=None, hosts=True):
+    '''
+    Writes parsed/hosts.txt and one parsed/services/<service>-<port>-<protocol>.txt per
+    service; services / hosts limit the output to those service keys / the host list
+    '''
+    if not os.path.exists(os.path.join(outdir, 'parsed')):
+        os.mkdir(os.path.join(outdir, 'parsed'))
+
+    if not os.path.exists(os.path.join(outdir, 'parsed', 'services')):
+        os.mkdir(os.path.join(outdir, 'parsed', 'services'))
+
+    if hosts:
+        write_lines(os.path.join(outdir, 'parsed', 'hosts.txt'), unique_hosts(host_list))
+
+    for service,hosts in service_array.items():
+        if services is not None and service not in services:
+            continue
+
+        write_lines(os.path.join(outdir, 'parsed', 'services', service_filename(service)), unique_hosts(hosts))
+
+def write_lines(outfile, lines):
+    '''
+    Streams lines (newline terminated) to outfile through a buffered text writer
+    '''
+    with open(outfile, 'w', encoding='utf-8', newline='\n', buffering=1024 * 1024) as f:
+        f.writelines(line + '\n' for line in lines)
+
+def unique_hosts(hosts):
+    '''
+    De-duplicated host addresses sorted by IP (anything that is not an IPv4 address
+    sorts after the IPv4 addresses, alphabetically)
+    '''
+    hosts = set(hosts)
+    try:
+        # plain IPv4 lists (the usual case) sort on the packed address alone
+        return sorted(hosts, key=socket.inet_aton)
+    except (OSError, TypeError):
+        return sorted(hosts, key=ip_sort_key)
+
+def service_filename(service):
+    return service[0] + '-' + service[1] + '-' + service[2] + '.txt'
+
+def watch_parsed_output(target, outdir, workers=1, cache_dir='', interval=60):
+    '''
+    Re-runs the -p export every interval seconds until interrupted, ingesting only
+    nmap files which are new or have changed since the last pass
+    '''
+    state = ParsedOutputState(outdir)
+    try:
+        while True:
+            changed = state.update(target, workers, cache_dir)
+            if changed:
+                print('[*] %d new or modified file(s) ingested' % changed)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+class ParsedOutputState(object):
+    '''
+    Persistent state behind the incremental (--watch) -p export
+
+    Keeps the hosts and services contributed by every nmap file seen so far, keyed by
+    path along with its size and mtime, in parsed/.watch_state (JSON) in the output
+    directory; a state file which can not be read is ignored. update() parses only
+    files which are new or have changed, then rewrites hosts.txt and the service files
+    whose host lists actually changed (and removes those of services which have
+    disappeared).
+    '''
+    FILENAME = '.watch_state'
+
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.path = os.path.join(outdir, 'parsed', self.FILENAME)
+        self.files = {}
+        if os.path.exists(self.path):
+            try:
+                self.files = self.load(self.path)
+            except (KeyError, TypeError, ValueError):
+                # unreadable (e.g. written by an older version) - start over
+                print('[!] Ignoring unreadable watch state ' + self.path)
+
+    def update(self, target, workers=1, cache_dir=''):
+        '''
+        Brings parsed/ up to date with the .xml files in target (a file or directory);
+        returns the number of new or changed files which were ingested
+        '''
+        if os.path.isdir(target):
+            sources = [os.path.join(target, f) for f in sorted(os.listdir(target))
+                       if f.endswith('.xml') and os.path.isfile(os.path.join(target, f))]
+        else:
+            sources = [target]
+
+        stats = dict((f, os.stat(f)) for f in sources)
+        changed = [f for f in sources if f not in self.files or
+                   self.files[f][:2] != (stats[f].st_size, stats[f].st_mtime)]
+        removed = [f for f in self.files if f not in stats]
+        if not changed and not removed and os.path.exists(self.path):
+            return 0
+
+        old_hosts, old_services = self.aggregate()
+
+        for f in removed:
+            del self.files[f]
+        reports = self.parse(changed, workers, cache_dir)
+        for f, report in reports.items():
+            host_list, service_array = parsed_services([report])
+            self.files[f] = (stats[f].st_size, stats[f].st_mtime, host_list, service_array)
+
+        host_list, service_array = self.aggregate()
+        services = set(key for key, hosts in service_array.items()
+                       if key not in old_services or set(old_services[key]) != set(hosts))
+        write_parsed_output(self.outdir, host_list, service_array, services,
+                            hosts=set(host_list) != set(old_hosts) or not os.path.exists(self.path))
+
+        for key in old_services:
+            filename = os.path.join(self.outdir, 'parsed', 'services', service_filename(key))
+            if key not in service_array and os.path.exists(filename):
+                os.remove(filename)
+
+        self.save()
+        return len(reports)
+
+    @staticmethod
+    def parse(files, workers=1, cache_dir=''):
+        '''
+        Returns {path: NmapScan} for those of files which parse
+
+        A file nmap is still writing is not yet well-formed XML; it is left out here (any
+        previously ingested version of it is kept) so it is tried again on the next pass.
+        '''
+        if workers > 1 and len(files) > 1:
+            try:
+                parser = NmapParser(files, workers=workers, cache_dir=cache_dir,
+                                    port_states=['open'], exclude_services=EXCLUDED_SERVICES)
+                parser.parse()
+                # one NmapScan per file, in input order
+                return dict(zip(files, parser.reports))
+            except Exception:
+                # lxml errors do not survive the trip back from a worker process, so
+                # fall back to parsing one file at a time to find the offending one(s)
+                pass
+
+        reports = {}
+        for f in files:
+            parser = NmapParser([f], cache_dir=cache_dir, port_states=['open'], exclude_services=EXCLUDED_SERVICES)
+            try:
+                parser.parse()
+            except etree.XMLSyntaxError as e:
+                print('[!] Could not parse %s (incomplete scan?) - will retry: %s' % (f, e))
+                continue
+            reports[f] = parser.reports[0]
+        return reports
+
+    def aggregate(self):
+        '''
+        Combined host list and service_array over all files (in path order)
+        '''
+        host_list = []
+        service_array = {}
+        for f in sorted(self.files):
+            size, mtime, hosts, services = self.files[f]
+            host_list.extend(hosts)
+            for key, service_hosts in services.items():
+                service_array.setdefault(key, []).extend(service_hosts)
+        return host_list, service_array
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            state = json.loads(f.read().decode('utf-8'))
+
+        files = {}
+        for path, size, mtime, hosts, services in state['files']:
+            files[path] = (size, mtime, hosts,
+                           dict(((service, port, protocol), service_hosts)
+                                for service, port, protocol, service_hosts in services))
+        return files
+
+    def save(self):
+        # service keys are (service, port, protocol) tuples, stored as one list per service
+        files = [[path, size, mtime, hosts, [list(key) + [service_hosts] for key, service_hosts in services.items()]]
+                 for path, (size, mtime, hosts, services) in sorted(self.files.items())]
+
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'files': files}, f)
+        os.replace(tmp, self.path)
+
 def output_file(outfile, output, overwrite=True):
     if overwrite == True:
         f = open(outfile, 'wb+')
@@ -250,7 +494,10 @@ def output_file(outfile, output, overwrite=True):
     f.close
 
 
-class NmapScan(object):
+class NmapScan(SlottedModel):
+    __slots__ = ['startstr', 'profile_name', 'scanner', 'version', 'args', 'services', 'protocol', 'numservices',
+                 'type', 'output', 'hosts']
+
     def __init__(self):
         self.startstr=''
         self.profile_name=''
@@ -264,7 +511,10 @@ class NmapScan(object):
         self.output=''
         self.hosts=[]
 
-class NmapHost(object):
+class NmapHost(SlottedModel):
+    __slots__ = ['status', 'addr_ipv4', 'addr_ipv6', 'addr_mac', 'addr_mac_vendor', 'hostnames', 'os_name',
+                 'os_accuracy', 'os_type', 'os_family', 'os_vendor', 'os_gen', 'ports', 'scripts']
+
     def __init__(self):
         self.status=''      #up or down
         self.addr_ipv4=''
@@ -281,7 +531,10 @@ class NmapHost(object):
         self.ports=[]
         self.scripts=[]
         
-class NmapPort(object):
+class NmapPort(SlottedModel):
+    __slots__ = ['protocol', 'portid', 'state', 'svc_name', 'svc_product', 'svc_version', 'svc_extrainfo',
+                 'svc_conf', 'scripts']
+
     def __init__(self):
         self.protocol=''    #tcp, udp
         self.portid=0       #port number
@@ -293,25 +546,60 @@ class NmapPort(object):
         self.svc_conf=0
         self.scripts=[]
 
-class NmapScript(object):
+class NmapScript(SlottedModel):
+    __slots__ = ['id', 'output']
+
     def __init__(self):
         self.id=''
         self.output=''
         
+# Bump whenever a change to the parsing code alters the results for the same input
+PARSER_VERSION = 1
+
+# Parsed reports in a ParseCache are only reused while the parser version and model
+# layout are unchanged
+CACHE_VERSION = model_signature(PARSER_VERSION, NmapScan, NmapHost, NmapPort, NmapScript)
+
 class NmapParser(object):
     '''
+    filename_xml may be a single .xml file, a directory or a list of files; with
+    workers > 1, parse() handles multiple files in that many worker processes and
+    the reports are returned in input order.
+
+    If cache_dir is given, the reports parsed from each file are kept in a ParseCache
+    there and reused as long as the file is unchanged.
+
+    Hosts and ports can be filtered while parsing, so discarded elements are never
+    turned into objects: host_states / port_states keep only hosts / ports in those
+    states (e.g. ['up'], ['open']), protocols keeps only ports of those protocols and
+    exclude_services drops ports whose service name is listed.
+
     TODO - add better file validation and move into a separate method
     '''
-    def __init__(self, filename_xml='', xml='', outdir=''):
+    def __init__(self, filename_xml='', xml='', outdir='', workers=1, cache_dir='',
+                 host_states=None, port_states=None, protocols=None, exclude_services=None):
         self._xml_source = []
         self._xml=''
         self.reports=[]
         self.outdir=outdir
+        self.workers=workers
+        self.cache_dir=cache_dir
+        self.host_states = frozenset(host_states) if host_states is not None else None
+        self.port_states = frozenset(port_states) if port_states is not None else None
+        self.protocols = frozenset(protocols) if protocols is not None else None
+        self.exclude_services = frozenset(exclude_services or ())
         
         if filename_xml:
             # Parse input values in order to find valid .xml files
             
-            if os.path.isdir(filename_xml):
+            if isinstance(filename_xml, list):
+                for f in filename_xml:
+                    if not os.path.exists(f):
+                        print("[!] File specified '%s' not exist!" % f)
+                        exit(3)
+                self._xml_source.extend(filename_xml)
+
+            elif os.path.isdir(filename_xml):
                 if not filename_xml.endswith("/"):
                     filename_xml += "/"
                 
@@ -370,85 +658,182 @@ class NmapParser(object):
             nmap_scan.output = output.text
         
         for host in nmaprun.findall('host'):
-            nmap_host=NmapHost()
+            nmap_host = self._parse_host(host)
+            if nmap_host is not None:
+                nmap_scan.hosts.append(nmap_host)
             
-            nmap_host.status = host.find('status').get('state')
-            
-            for address in host.findall('address'):
-                if address.get('addrtype')=='ipv4':
-                    nmap_host.addr_ipv4=address.get('addr')
-                if address.get('addrtype')=='ipv6':
-                    nmap_host.addr_ipv6=address.get('addr')
-                if address.get('addrtype')=='mac':
-                    nmap_host.addr_mac=address.get('addr')
-                    nmap_host.addr_mac_vendor=address.get('vendor')
-            
-            hostnames = host.find('hostnames')
-            for hostname in hostnames.findall('hostname'):
-                nmap_host.hostnames.append(hostname.get('name'))
-            
-            os=host.find('os')
-            if os is not None:
-                osmatch=os.find('osmatch')
-                if osmatch is not None:
-                    nmap_host.os_name = osmatch.get('name')
-                    nmap_host.os_accuracy = int(osmatch.get('accuracy'))
-                    osclass=osmatch.find('osclass')
-                    if osclass is not None:
-                        nmap_host.os_type=osclass.get('type')
-                        nmap_host.os_family=osclass.get('osfamily')
-                        nmap_host.os_vendor=osclass.get('vendor')
-                        nmap_host.os_gen=osclass.get('osgen')
-            
-            hostscript=host.find('hostscript')
-            if hostscript is not None:
-                scripts=hostscript.findall('script')
-                for script in scripts:
-                    nmap_host_script=NmapScript()
-                    nmap_host_script.id=script.get('id')
-                    nmap_host_script.output=script.get('output')
-                    nmap_host.scripts.append(nmap_host_script)
-                
+        self.reports.append(nmap_scan)
+
+    def iter_hosts(self):
+        '''
+        Generator yielding NmapHost objects one at a time
+
+        Uses iterparse on host end events and frees each processed element (and any
+        siblings already handled) so memory stays flat no matter how many hosts the
+        scan contains.
+        '''
+        if self._xml_source:
+            sources = self._xml_source
+        elif self._xml:
+            xml = self._xml
+            if isinstance(xml, str):
+                xml = xml.encode('utf-8')
+            sources = [BytesIO(xml)]
+        else:
+            sources = []
+
+        for source in sources:
+            for event, host in etree.iterparse(source, events=('end',), tag='host'):
+                nmap_host = self._parse_host(host)
+
+                # Free the processed element along with preceding siblings still hanging
+                # off the nmaprun node so the tree never grows past the current host
+                host.clear()
+                while host.getprevious() is not None:
+                    del host.getparent()[0]
+
+                if nmap_host is not None:
+                    yield nmap_host
+
+    def _parse_host(self, host):
+        '''
+        Returns an NmapHost for the host element, or None if it is filtered out
+        '''
+        status = host.find('status').get('state')
+        if self.host_states is not None and status not in self.host_states:
+            return None
+
+        nmap_host=NmapHost()
+        
+        nmap_host.status = status
+        
+        for address in host.findall('address'):
+            if address.get('addrtype')=='ipv4':
+                nmap_host.addr_ipv4=address.get('addr')
+            if address.get('addrtype')=='ipv6':
+                nmap_host.addr_ipv6=address.get('addr')
+            if address.get('addrtype')=='mac':
+                nmap_host.addr_mac=address.get('addr')
+                nmap_host.addr_mac_vendor=address.get('vendor')
+        
+        # down hosts (e.g. from ping sweeps) may carry no hostnames / ports at all
+        for hostname in host.iterfind('hostnames/hostname'):
+            nmap_host.hostnames.append(hostname.get('name'))
+        
+        os=host.find('os')
+        if os is not None:
+            osmatch=os.find('osmatch')
+            if osmatch is not None:
+                nmap_host.os_name = osmatch.get('name')
+                nmap_host.os_accuracy = int(osmatch.get('accuracy'))
+                osclass=osmatch.find('osclass')
+                if osclass is not None:
+                    nmap_host.os_type=osclass.get('type')
+                    nmap_host.os_family=osclass.get('osfamily')
+                    nmap_host.os_vendor=osclass.get('vendor')
+                    nmap_host.os_gen=osclass.get('osgen')
+        
+        hostscript=host.find('hostscript')
+        if hostscript is not None:
+            scripts=hostscript.findall('script')
+            for script in scripts:
+                nmap_host_script=NmapScript()
+                nmap_host_script.id=script.get('id')
+                nmap_host_script.output=script.get('output')
+                nmap_host.scripts.append(nmap_host_script)
             
-            ports=host.find('ports')
-            for port in ports.findall('port'):
-                nmap_port=NmapPort()
-                nmap_port.protocol=port.get('protocol')
-                nmap_port.portid=port.get('portid')
-                nmap_port.state=port.find('state').get('state')
-                nmap_port.svc_name=port.find('service').get('name')
-                nmap_port.svc_product=port.find('service').get('product')
-                nmap_port.svc_version=port.find('service').get('version')
-                nmap_port.svc_extrainfo=port.find('service').get('extrainfo')
-                nmap_port.svc_conf=port.find('service').get('conf')
-                
-                scripts=port.findall('script')
-                for script in scripts:
-                    nmap_port_script=NmapScript()
-                    nmap_port_script.id=script.get('id')
-                    nmap_port_script.output=script.get('output')
-                    nmap_port.scripts.append(nmap_port_script)
-                
-                nmap_host.ports.append(nmap_port)
+        
+        for port in host.iterfind('ports/port'):
+            protocol=port.get('protocol')
+            if self.protocols is not None and protocol not in self.protocols:
+                continue
+
+            state=port.find('state').get('state')
+            if self.port_states is not None and state not in self.port_states:
+                continue
+
+            if self.exclude_services and port.find('service').get('name') in self.exclude_services:
+                continue
+
+            nmap_port=NmapPort()
+            nmap_port.protocol=protocol
+            nmap_port.portid=port.get('portid')
+            nmap_port.state=state
+            nmap_port.svc_name=port.find('service').get('name')
+            nmap_port.svc_product=port.find('service').get('product')
+            nmap_port.svc_version=port.find('service').get('version')
+            nmap_port.svc_extrainfo=port.find('service').get('extrainfo')
+            nmap_port.svc_conf=port.find('service').get('conf')
             
-            nmap_scan.hosts.append(nmap_host)
+            scripts=port.findall('script')
+            for script in scripts:
+                nmap_port_script=NmapScript()
+                nmap_port_script.id=script.get('id')
+                nmap_port_script.output=script.get('output')
+                nmap_port.scripts.append(nmap_port_script)
             
-        self.reports.append(nmap_scan)
+            nmap_host.ports.append(nmap_port)
+
+        return nmap_host
 
     def parse(self):
 
-        # For each .xml file found...
         if self._xml_source:
-            for file_nmaprun in self._xml_source:
-                # Parse and extract information
-                self._parse_results(file_nmaprun)
+            cache = ParseCache(self.cache_dir) if self.cache_dir else None
+            try:
+                cached = {}
+                if cache:
+                    for f in self._xml_source:
+                        reports = cache.get('nmap', f, self._cache_version())
+                        if reports is not None:
+                            cached[f] = reports
+
+                pending = [f for f in self._xml_source if f not in cached]
+                parsed = {}
+                if self.workers > 1 and len(pending) > 1:
+                    # Parse files in worker processes; results come back in input order
+                    filters = self._filters()
+                    parsed = dict(zip(pending, parallel_map(_parse_nmap_file, [(f, filters) for f in pending], self.workers)))
+
+                # For each .xml file found...
+                for file_nmaprun in self._xml_source:
+                    if file_nmaprun in cached:
+                        self.reports.extend(cached[file_nmaprun])
+                        continue
+
+                    start = len(self.reports)
+                    if file_nmaprun in parsed:
+                        self.reports.extend(parsed[file_nmaprun])
+                    else:
+                        # Parse and extract information
+                        self._parse_results(file_nmaprun)
+
+                    if cache:
+                        cache.put('nmap', file_nmaprun, self.reports[start:], self._cache_version())
+            finally:
+                if cache:
+                    cache.close()
         elif self._xml:
             self._parse_results('', self._xml)
         else:
             print('no data to parse?!?')
 
+    def _filters(self):
+        return dict(host_states=self.host_states, port_states=self.port_states, protocols=self.protocols,
+                    exclude_services=self.exclude_services)
+
+    def _cache_version(self):
+        # filtered results are cached separately from unfiltered ones
+        filters = sorted((name, sorted(value) if value is not None else None) for name, value in self._filters().items())
+        return CACHE_VERSION + repr(filters)
 
     def merge(self, outdir=''):
+        '''
+        Concatenates the hosts from all source files into merged.xml in outdir
+
+        Each input is streamed with iterparse and its hosts are written straight to
+        the output through etree.xmlfile, so only one host is held in memory at a time
+        '''
         if not outdir:
             outdir=self.outdir
 
@@ -456,33 +841,46 @@ class NmapParser(object):
             print('Single xml file provided; aborting merge')
         else:
 
-            dummy_header  = '<?xml version="1.0" encoding="UTF-8"?>'
-            dummy_header += '<!DOCTYPE nmaprun>'
-            dummy_header += '<?xml-stylesheet href="file:///usr/share/nmap/nmap.xsl" type="text/xsl"?>'
-            dummy_header += '<!-- Nmap merged with nmap_parser.py - https://github.com/isaudits/parsers/blob/master/nmap_parser.py -->'
-            dummy_header += '<nmaprun scanner="nmap" args="nmap" version="7.70" xmloutputversion="1.04">'
-            dummy_header += '<scaninfo type="syn" protocol="tcp" numservices="1" services="1"/>'
-            dummy_header += '<verbose level="0"/>'
-            dummy_header += '<debugging level="0"/>'
-
-            output = dummy_header
-
-            for file_nmaprun in self._xml_source:
-                tree = etree.parse(file_nmaprun)
-                for host in tree.findall('host'):
-                    output += etree.tostring(host, encoding='unicode', method='xml')
-
-            dummy_footer  = '<runstats><finished time="1" timestr="Wed Sep  0 00:00:00 0000" elapsed="0" summary="Nmap done at Wed Sep  0 00:00:00 0000; 0 IP address scanned in 0.0 seconds" exit="success"/>'
-            dummy_footer += '</runstats>'
-            dummy_footer += '</nmaprun>'
-
-            output += '\n' + dummy_footer
-
             outfile=os.path.join(outdir,"merged.xml")
 
-            output_file(outfile,bytes(output,'utf-8'))
+            with etree.xmlfile(outfile, encoding='UTF-8') as xf:
+                xf.write_declaration()
+                xf.write_doctype('<!DOCTYPE nmaprun>')
+                xf.write(etree.ProcessingInstruction('xml-stylesheet', 'href="file:///usr/share/nmap/nmap.xsl" type="text/xsl"'))
+                xf.write(etree.Comment(' Nmap merged with nmap_parser.py - https://github.com/isaudits/parsers/blob/master/nmap_parser.py '))
+
+                with xf.element('nmaprun', scanner="nmap", args="nmap", version="7.70", xmloutputversion="1.04"):
+                    xf.write(etree.Element('scaninfo', type="syn", protocol="tcp", numservices="1", services="1"))
+                    xf.write(etree.Element('verbose', level="0"))
+                    xf.write(etree.Element('debugging', level="0"))
+
+                    for file_nmaprun in self._xml_source:
+                        for event, host in etree.iterparse(file_nmaprun, events=('end',), tag='host'):
+                            xf.write(host)
+
+                            # Free the written host along with anything before it in the file
+                            host.clear()
+                            while host.getprevious() is not None:
+                                del host.getparent()[0]
+
+                    xf.write('\n')
+                    runstats = etree.Element('runstats')
+                    etree.SubElement(runstats, 'finished', time="1", timestr="Wed Sep  0 00:00:00 0000", elapsed="0",
+                                     summary="Nmap done at Wed Sep  0 00:00:00 0000; 0 IP address scanned in 0.0 seconds",
+                                     exit="success")
+                    xf.write(runstats)
 
             
     
+def _parse_nmap_file(args):
+    '''
+    Worker process entry point - parses a single nmap xml file and returns its reports
+    '''
+    file_nmaprun, filters = args
+    parser = NmapParser([file_nmaprun], **filters)
+    parser.parse()
+    return parser.reports
+
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
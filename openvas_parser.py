@@ -14,6 +14,7 @@ See README.md for licensing information and credits
 '''
 import argparse
 import os
+from io import BytesIO
 
 try:
     from lxml import etree
@@ -22,6 +23,13 @@ except:
     print("pip install lxml")
     print("     ----- OR -----")
     print("apt-get install python-lxml")
+
+try:
+    from .text_normalizer import TextNormalizer, normalize_name, normalize_paragraph, normalize_solution
+    from .parser_utils import ParseCache, SlottedModel, model_signature, parallel_map
+except ImportError:
+    from text_normalizer import TextNormalizer, normalize_name, normalize_paragraph, normalize_solution
+    from parser_utils import ParseCache, SlottedModel, model_signature, parallel_map
     
 
 def main():
@@ -44,11 +52,25 @@ def main():
                         help='Parse openvas output files',
                         action='store_true'
     )
+    parser.add_argument('--missing-hosts', action='store', choices=OpenvasParser.MISSING_HOST_POLICIES,
+                        default='drop',
+                        help='What to do with results for a host missing from the report host list: drop them (default), '
+                             'add a host for them or stop with an error'
+    )
+    parser.add_argument('-j', '--jobs', action='store', type=int, default=1,
+                        help='Number of worker processes used to parse multiple files (default 1)'
+    )
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='Do not read or update the parse cache kept in the output directory'
+    )
     args = parser.parse_args()
     
     target = args.openvas_input
     outdir = args.outdir
     is_parse = args.parse
+    jobs = args.jobs
+    use_cache = args.cache
+    missing_hosts = args.missing_hosts
     
     #------------------------------------------------------------------------------
     # Main stuff
@@ -80,14 +102,13 @@ def main():
 
     
     #This currently doesnt really do anything - for debug purposes only            
-    if is_parse:
-        for infile in infile_list:
-            parse_xml(infile)
+    if is_parse and infile_list:
+        parse_xml(infile_list, jobs, outdir if use_cache else '', missing_hosts)
         
     print("\n\nComplete!")
 
-def parse_xml(filename_xml):
-    parser = OpenvasParser(filename_xml)
+def parse_xml(filename_xml, workers=1, cache_dir='', missing_hosts='drop'):
+    parser = OpenvasParser(filename_xml, workers=workers, cache_dir=cache_dir, missing_hosts=missing_hosts)
 
 def transform_to_html(infile, outfile, xsl):
     '''
@@ -153,12 +174,16 @@ def chop_port(portstring):
 	
 	return portinfo
 
-class OpenvasReport(object):
+class OpenvasReport(SlottedModel):
+    __slots__ = ['name', 'hosts']
+
     def __init__(self):
         self.name=''
         self.hosts=[]
 
-class OpenvasReportHost(object):
+class OpenvasReportHost(SlottedModel):
+    __slots__ = ['name', 'host_ip', 'scan_start', 'scan_end', 'hostname', 'os', 'cpe', 'report_items']
+
     def __init__(self):
         self.name=''
         self.host_ip=''
@@ -169,10 +194,20 @@ class OpenvasReportHost(object):
         self.cpe=''
         self.report_items=[]
         
-class OpenvasReportItem(object):
+class OpenvasReportItem(SlottedModel):
+    '''
+    A single result; the NVT_FIELDS values are shared by all results of the same NVT in
+    a report, so assign a new list (cve, bid, url) rather than modifying one in place
+    '''
+    __slots__ = ['name', 'host', 'asset_id', 'port', 'protocol', 'svc_name', 'comment', 'scan_nvt_version', 'threat',
+                 'severity', 'description', 'original_threat', 'original_severity', 'notes', 'overrides', 'oid',
+                 'type', 'family', 'cvss_base', 'cve', 'bid', 'url', 'cvss_base_vector', 'summary', 'vuldetect',
+                 'insight', 'impact', 'affected', 'solution', 'solution_type', 'qod_type', 'refs']
+
     def __init__(self):
         
         self.name=''
+        self.host=''
         self.asset_id = ''
         self.port=''
         self.protocol=''
@@ -197,6 +232,7 @@ class OpenvasReportItem(object):
         self.cve=[]
         self.bid=[]
         self.url=[]
+        self.refs={}            #every ref by type - cve, bid, url, cert-bund, dfn-cert, etc
         
         #tags
         self.cvss_base_vector=''
@@ -204,18 +240,89 @@ class OpenvasReportItem(object):
         self.vuldetect=''
         self.insight=''
         self.impact=''
+        self.affected=''
         self.solution=''
         self.solution_type=''
         self.qod_type=''
         
+# Bump whenever a change to the parsing code alters the results for the same input
+PARSER_VERSION = 1
+
+# Parsed reports in a ParseCache are only reused while the parser version and model
+# layout are unchanged
+CACHE_VERSION = model_signature(PARSER_VERSION, OpenvasReport, OpenvasReportHost, OpenvasReportItem)
+
+# Result fields which only depend on the NVT; parsed once per OID in each report and
+# shared by all of its results
+NVT_FIELDS = ['type', 'family', 'cvss_base', 'cve', 'bid', 'url', 'refs', 'cvss_base_vector', 'summary', 'vuldetect',
+              'insight', 'impact', 'affected', 'solution', 'solution_type', 'qod_type']
+
+# Result / nvt child nodes extracted as is (TEXT), as a number (FLOAT) or specially
+TEXT_NODE, FLOAT_NODE, PORT_NODE, NVT_NODE = range(4)
+RESULT_NODES = {'name': TEXT_NODE, 'host': TEXT_NODE, 'port': PORT_NODE, 'nvt': NVT_NODE,
+                'comment': TEXT_NODE, 'scan_nvt_version': TEXT_NODE, 'threat': TEXT_NODE, 'severity': FLOAT_NODE,
+                'description': TEXT_NODE, 'original_threat': TEXT_NODE, 'original_severity': FLOAT_NODE,
+                'notes': TEXT_NODE, 'overrides': TEXT_NODE}
+NVT_NODES = {'type': TEXT_NODE, 'family': TEXT_NODE, 'cvss_base': FLOAT_NODE}
+
+# Ref types which also get an item attribute of their own (all of them are in refs)
+REF_TYPES = ['cve', 'bid', 'url']
+
+TAG_FIELDS = ['summary', 'insight', 'impact', 'affected', 'solution', 'cvss_base_vector', 'qod_type', 'solution_type',
+              'vuldetect']
+
 class OpenvasParser(object):
-    def __init__(self, filename_xml='', xml=''):
+    '''
+    Parses OpenVAS / GVM xml reports into OpenvasReport objects
+
+    By default every file is parsed up front into self.reports. Pass stream=True to
+    skip that and pull results one at a time from iter_results() instead.
+
+    The NVT details of a result (type, family, refs, tags and the cleaned up summary /
+    insight / solution text) are parsed once per OID in each report and shared by all
+    results of that NVT; cleaned up result names are memoized per OID unless
+    text_cache=False is passed.
+
+    filename_xml may be a single .xml file, a directory or a list of files; with
+    workers > 1, multiple files are parsed in that many worker processes and the
+    reports are returned in input order.
+
+    If cache_dir is given, the reports parsed from each file are kept in a ParseCache
+    there and reused as long as the file is unchanged.
+
+    Results are attached to the report host with the same IP. missing_hosts sets what
+    happens to results whose host is not in the report host list:
+        drop  - the result is skipped
+        add   - a host (IP only) is added to the report for it
+        error - ValueError is raised
+    '''
+    MISSING_HOST_POLICIES = ['drop', 'add', 'error']
+
+    def __init__(self, filename_xml='', xml='', stream=False, text_cache=True, workers=1, cache_dir='',
+                 missing_hosts='drop'):
+        if missing_hosts not in self.MISSING_HOST_POLICIES:
+            raise ValueError("missing_hosts must be one of %s" % ', '.join(self.MISSING_HOST_POLICIES))
+
         self.reports=[]
+        self.workers=workers
+        self.cache_dir=cache_dir
+        self.missing_hosts=missing_hosts
+        self._text_cache = text_cache
+        self._normalizer = TextNormalizer(cache=text_cache)
+        self._nvts = {}
+        self._nvt_refs = etree.XPath('refs/ref')
+        self._xml_source = []
+        self._xml=''
         
         if filename_xml:
             # Parse input values in order to find valid .xml files
-            self._xml_source = []
-            if os.path.isdir(filename_xml):
+            if isinstance(filename_xml, list):
+                for f in filename_xml:
+                    if not os.path.exists(f):
+                        print("[!] File specified '%s' not exist!" % f)
+                        exit(3)
+                self._xml_source.extend(filename_xml)
+            elif os.path.isdir(filename_xml):
                 if not filename_xml.endswith("/"):
                     filename_xml += "/"
                 # Automatic searching of files into specified directory
@@ -234,137 +341,313 @@ class OpenvasParser(object):
                 print("[!] No file .xml to parse was found!")
                 exit(3)
             
-            # For each .nessus file found...
-            for report in self._xml_source:
-                # Parse and extract information
-                self._parse_results(report)
+            if not stream:
+                self._parse_files()
                 
         elif xml:
-            self._parse_results('',xml)
+            self._xml = xml
+            if not stream:
+                self._parse_results('', xml)
             
         else:
             print("[!] No xml data passed to parser!")
             exit(1)
 
+    def _parse_files(self):
+        cache = ParseCache(self.cache_dir) if self.cache_dir else None
+        try:
+            cached = {}
+            if cache:
+                for f in self._xml_source:
+                    reports = cache.get('openvas', f, self._cache_version())
+                    if reports is not None:
+                        cached[f] = reports
+
+            pending = [f for f in self._xml_source if f not in cached]
+            parsed = {}
+            if self.workers > 1 and len(pending) > 1:
+                # Parse files in worker processes; results come back in input order
+                parsed = dict(zip(pending, parallel_map(_parse_openvas_file,
+                                                        [(f, self._text_cache, self.missing_hosts) for f in pending],
+                                                        self.workers)))
+
+            # For each .xml file found...
+            for report in self._xml_source:
+                if report in cached:
+                    self.reports.extend(cached[report])
+                    continue
+
+                start = len(self.reports)
+                if report in parsed:
+                    self.reports.extend(parsed[report])
+                else:
+                    # Parse and extract information
+                    self._parse_results(report)
+
+                if cache:
+                    cache.put('openvas', report, self.reports[start:], self._cache_version())
+        finally:
+            if cache:
+                cache.close()
+
+    def _cache_version(self):
+        # the missing host policy changes what is parsed, so cached results depend on it
+        return CACHE_VERSION + ':' + self.missing_hosts
+
+    def iter_results(self):
+        '''
+        Generator yielding (OpenvasReportHost, OpenvasReportItem) for every result, one
+        at a time - the streaming counterpart of parsing up front (use with stream=True)
+
+        Each file is read twice with iterparse: first for the report host details, then
+        for the results, clearing every element once consumed, so memory is bounded by
+        the number of hosts rather than results. The hosts yielded are not populated
+        (report_items is left empty); results are matched to them by IP as usual.
+        '''
+        for source in self._sources():
+            reports = self._read_hosts(source)
+            for hosts, openvas_report_item in self._iter_report_items(source, reports):
+                for host in hosts:
+                    yield host, openvas_report_item
+
+    def _sources(self):
+        if self._xml_source:
+            return self._xml_source
+        xml = self._xml
+        if isinstance(xml, str):
+            xml = xml.encode('utf-8')
+        return [xml]
+
     def _parse_results(self, file_report='', xml_report=''):
+        source = file_report
+        if not source:
+            source = xml_report.encode('utf-8') if isinstance(xml_report, str) else xml_report
+
+        reports = self._read_hosts(source)
+        for hosts, openvas_report_item in self._iter_report_items(source, reports):
+            #Append report finding to the matching host(s) as report_item
+            for host in hosts:
+                host.report_items.append(openvas_report_item)
+
+        self.reports.extend(openvas_report for openvas_report, hosts_by_ip in reports)
+
+    def _read_hosts(self, source):
+        '''
+        First pass over source - returns [(OpenvasReport, hosts_by_ip)], one per report,
+        holding the report hosts (no results yet) and an IP -> [hosts] index of them
+        '''
+        reports = []
+        for element in _iter_report_elements(source, 'host'):
+            if element is None:
+                reports.append((OpenvasReport(), {}))
+                continue
+
+            openvas_report, hosts_by_ip = reports[-1]
+            openvas_report_host = self._parse_host(element)
+            if openvas_report_host:
+                # Add information extracted to data structure
+                openvas_report.hosts.append(openvas_report_host)
+                hosts_by_ip.setdefault(openvas_report_host.name, []).append(openvas_report_host)
+        return reports
+
+    def _iter_report_items(self, source, reports):
+        '''
+        Second pass over source - yields (hosts, OpenvasReportItem) for every result,
+        hosts being the report hosts with the result's IP (see missing_hosts)
+        '''
+        report_number = -1
+        for element in _iter_report_elements(source, 'result'):
+            if element is None:
+                report_number += 1
+                self._nvts = {}
+                continue
+
+            openvas_report, hosts_by_ip = reports[report_number]
+            openvas_report_item = self._parse_result(element)
+            hosts = hosts_by_ip.get(openvas_report_item.host)
+            if hosts is None:
+                hosts = self._missing_host(openvas_report, hosts_by_ip, openvas_report_item.host)
+            yield hosts, openvas_report_item
+
+    def _parse_host(self, host):
+        '''
+        Builds an OpenvasReportHost from a report level host element (None if it has no IP)
+        '''
+        openvas_report_host = OpenvasReportHost()
         
-        if file_report:
-            tree = etree.parse(file_report)
-        elif xml_report:
-            tree = etree.fromstring(xml_report)
+        openvas_report_host.name = host.find('ip').text
         
-        for report in tree.findall('./report'):
+        if not openvas_report_host.name:
+            return None
+            
+        openvas_report_host.host_ip = openvas_report_host.name
+        openvas_report_host.scan_start = host.find('start').text
+        openvas_report_host.scan_end = host.find('end').text
+        hostprops = host.findall("detail")
         
-            openvas_report = OpenvasReport()
+        for prop in hostprops:
+            name = prop.find('name').text
+            value = prop.find('value').text
             
-            # For each host in report file, it extracts information
-            for host in report.findall('./host'):
-                openvas_report_host = OpenvasReportHost()
+            if name == 'best_os_txt':
+                openvas_report_host.os = value
                 
-                openvas_report_host.name = host.find('ip').text
+            if name == 'hostname':
+                openvas_report_host.hostname = value
                 
-                if openvas_report_host.name:
-                    
-                    openvas_report_host.host_ip = openvas_report_host.name
-                    openvas_report_host.scan_start = host.find('start').text
-                    openvas_report_host.scan_end = host.find('end').text
-                    hostprops = host.findall("detail")
-                    
-                    for prop in hostprops:
-                        name = prop.find('name').text
-                        value = prop.find('value').text
-                        
-                        if name == 'best_os_txt':
-                            openvas_report_host.os = value
-                            
-                        if name == 'hostname':
-                            openvas_report_host.hostname = value
-                            
-                        if name == 'best_os_cpe':
-                            openvas_report_host.cpe = value
-                                
-                    # Add information extracted to data structure
-                    openvas_report.hosts.append(openvas_report_host)
-                    
-            for result in report.findall('./results/result'):
-                openvas_report_item = OpenvasReportItem()
-                openvas_report_item.name = result.find('./name').text
-                openvas_report_item.host = result.find('./host').text
-                #openvas_report_item.asset_id = result.find('./host/asset').attrib['asset_id']
-                portinfo = chop_port(result.find('./port').text)
+            if name == 'best_os_cpe':
+                openvas_report_host.cpe = value
+
+        return openvas_report_host
+
+    def _parse_result(self, result):
+        '''
+        Builds an OpenvasReportItem from a result element
+        '''
+        openvas_report_item = OpenvasReportItem()
+        nvt = None
+
+        # Walk the result's children once, dispatching on tag via the RESULT_NODES table;
+        # only the first instance of a node is used
+        seen = set()
+        for node in result:
+            tag = node.tag
+            node_type = RESULT_NODES.get(tag)
+            if node_type is None or tag in seen:
+                continue
+            seen.add(tag)
+
+            if node_type == TEXT_NODE:
+                setattr(openvas_report_item, tag, node.text)
+            elif node_type == FLOAT_NODE:
+                setattr(openvas_report_item, tag, float(node.text))
+            elif node_type == PORT_NODE:
+                portinfo = chop_port(node.text)
                 openvas_report_item.port = portinfo['port']
                 openvas_report_item.protocol = portinfo['protocol']
                 openvas_report_item.svc_name = portinfo['service']
-                
-                items=['comment','scan_nvt_version','threat','severity','description','original_threat','original_severity','notes','overrides']
-                for item in items:
-                    node = result.find(item)
-                    if node is not None:
-                        if item == 'severity' or item == 'original_severity':
-                            setattr(openvas_report_item,item,float(node.text))
-                        else:
-                            setattr(openvas_report_item,item,node.text)
-                
-                openvas_report_item.oid = result.find('nvt').attrib['oid']
-                items=['type','family','cvss_base']
-                for item in items:
-                    node = result.find('.nvt/'+item)
-                    if node is not None:
-                        if item == 'cvss_base':
-                            setattr(openvas_report_item,item,float(node.text))
-                        else:
-                            setattr(openvas_report_item,item,node.text)
-                    
-                items=['cve','bid','url']
-                for item in items:
-                    if item.find('.nvt/refs/ref/[@type="'+item+'"]') is not None:
-                        array=[]
-                        for ref in result.findall('.nvt/refs/ref/[@type="'+item+'"]'):
-                            array.append(ref.attrib['id'])
-                        setattr(openvas_report_item,item,array)
-                
-                #Parse info from tags element text
-                tags = result.find('./nvt/tags').text
-                if tags is not None:
-                    tags = dict((k.strip(), v.strip()) for k,v in (item.split('=',1) for item in tags.split("|")))
-                    items = ['summary', 'insight', 'impact', 'affected', 'solution', 'cvss_base_vector', 'qod_type', 'solution_type', 'vuldetect']
-                    for item in items:
-                        if item in tags:
-                            setattr(openvas_report_item,item,tags[item])
-
-                #Cleanup some of the screwball formatting from OpenVAS
-                openvas_report_item.name = openvas_report_item.name.replace(")-", ") - ")
-                openvas_report_item.name = openvas_report_item.name.replace("s(", "s (")
-                openvas_report_item.name = openvas_report_item.name.replace("e(", "e (")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n  -", "\n•")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n -", "\n•")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n\n  ", "\n\n")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n\n ", "\n\n")
-                openvas_report_item.summary = openvas_report_item.summary.replace("     ", " ")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n    ", " ")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n   ", " ")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n  ", " ")
-                openvas_report_item.summary = openvas_report_item.summary.replace("\n ", " ")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n  -", "\n•")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n -", "\n•")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n\n  ", "\n\n")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n\n ", "\n\n")
-                openvas_report_item.insight = openvas_report_item.insight.replace("     ", " ")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n    ", " ")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n   ", " ")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n  ", " ")
-                openvas_report_item.insight = openvas_report_item.insight.replace("\n ", " ")
-                openvas_report_item.solution = openvas_report_item.solution.replace("\n  -", "\n•")
-                openvas_report_item.solution = openvas_report_item.solution.replace("\n -", "\n•")
-                openvas_report_item.solution = openvas_report_item.solution.replace("\n  ", " ")
-                openvas_report_item.solution = openvas_report_item.solution.replace("\n ", " ")
-                
-                #Find appropriate host and append report finding as report_item
-                for host in openvas_report.hosts:
-                    if host.name == openvas_report_item.host:
-                        host.report_items.append(openvas_report_item)
-                    
-        self.reports.append(openvas_report)
+            else:
+                nvt = node
+        #openvas_report_item.asset_id = result.find('./host/asset').attrib['asset_id']
+
+        openvas_report_item.oid = oid = nvt.attrib['oid']
+
+        # NVT details (type, refs, tags, etc) only depend on the OID - parse them on first sight
+        nvt_values = self._nvts.get(oid)
+        if nvt_values is None:
+            nvt_values = self._nvts[oid] = self._parse_nvt(nvt)
+        for field, value in zip(NVT_FIELDS, nvt_values):
+            setattr(openvas_report_item, field, value)
+
+        #Cleanup some of the screwball formatting from OpenVAS
+        openvas_report_item.name = self._normalizer.normalize(normalize_name, openvas_report_item.name, oid)
+
+        return openvas_report_item
+
+    def _parse_nvt(self, nvt):
+        '''
+        Returns the values of the NVT_FIELDS for an nvt element, with the summary /
+        insight / solution text cleaned up
+        '''
+        openvas_report_item = OpenvasReportItem()
+
+        seen = set()
+        tags = None
+        for node in nvt:
+            tag = node.tag
+            if tag == 'tags':
+                if tags is None:
+                    tags = node.text or ''
+                continue
+            node_type = NVT_NODES.get(tag)
+            if node_type is None or tag in seen:
+                continue
+            seen.add(tag)
+            setattr(openvas_report_item, tag, float(node.text) if node_type == FLOAT_NODE else node.text)
+
+        # Single pass over the refs, grouped by their type attribute
+        refs = {}
+        for ref in self._nvt_refs(nvt):
+            refs.setdefault(ref.get('type'), []).append(ref.get('id'))
+        openvas_report_item.refs = refs
+        for ref_type in REF_TYPES:
+            setattr(openvas_report_item, ref_type, refs.get(ref_type, []))
+        
+        #Parse info from tags element text
+        if tags:
+            tags = dict((k.strip(), v.strip()) for k,v in (item.split('=',1) for item in tags.split("|")))
+            for item in TAG_FIELDS:
+                if item in tags:
+                    setattr(openvas_report_item,item,tags[item])
+
+        #Cleanup some of the screwball formatting from OpenVAS
+        openvas_report_item.summary = normalize_paragraph(openvas_report_item.summary)
+        openvas_report_item.insight = normalize_paragraph(openvas_report_item.insight)
+        openvas_report_item.solution = normalize_solution(openvas_report_item.solution)
+
+        return tuple(getattr(openvas_report_item, field) for field in NVT_FIELDS)
+
+    def _missing_host(self, openvas_report, hosts_by_ip, host_ip):
+        '''
+        Applies the missing_hosts policy to a result for host_ip, which is not in the
+        report host list; returns the hosts to attach the result to
+        '''
+        if self.missing_hosts == 'error':
+            raise ValueError("result for host '%s' which is not in the report host list" % host_ip)
+
+        hosts = hosts_by_ip[host_ip] = []
+        if self.missing_hosts == 'add':
+            openvas_report_host = OpenvasReportHost()
+            openvas_report_host.name = host_ip
+            openvas_report_host.host_ip = host_ip
+            openvas_report.hosts.append(openvas_report_host)
+            hosts.append(openvas_report_host)
+        return hosts
+
+
+def _iter_report_elements(source, tag):
+    '''
+    Streams source (a file name or xml bytes) with iterparse, yielding None at the
+    start of each report and then its report level host elements (tag='host') or its
+    results/result elements (tag='result')
+
+    The other kind of element, and each yielded element once the caller is done with
+    it, are cleared and dropped from the tree as parsing goes along.
+    '''
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    for event, element in etree.iterparse(source, events=('start', 'end'), tag=('report', 'host', 'result')):
+        parent = element.getparent()
+        if element.tag == 'report':
+            # reports are the children of the document element
+            if event == 'start' and parent is not None and parent.getparent() is None:
+                yield None
+            continue
+
+        if event != 'end':
+            continue
+
+        if element.tag == 'host':
+            # skip the host element inside each result
+            if parent.tag != 'report':
+                continue
+        elif parent.tag != 'results':
+            continue
+
+        if element.tag == tag:
+            yield element
+
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+def _parse_openvas_file(args):
+    '''
+    Worker process entry point - parses a single OpenVAS xml file and returns its reports
+    '''
+    filename_xml, text_cache, missing_hosts = args
+    return OpenvasParser([filename_xml], text_cache=text_cache, missing_hosts=missing_hosts).reports
 
 
 if __name__ == '__main__':
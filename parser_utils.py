@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+IS Audits & Consulting, LLC
+TJS Deemer Dana LLP
+
+Helpers shared by the scan parsers (nessus_parser, nmap_parser, openvas_parser, etc)
+
+See README.md for licensing information and credits
+
+'''
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from lxml import etree
+except:
+    print("lxml module not installed try: ")
+    print("pip install lxml")
+    print("     ----- OR -----")
+    print("apt-get install python-lxml")
+
+
+class SlottedModel(object):
+    '''
+    Base for the parser result classes; subclasses list their attributes in __slots__
+
+    Pickles as a plain tuple of slot values (no attribute names per object) which keeps
+    results small when they are shipped back from worker processes. Every subclass is
+    registered by class name so dump_models() / load_models() can store results on disk
+    as JSON, independent of the module they were parsed in.
+    '''
+    __slots__ = ()
+    _models = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        SlottedModel._models[cls.__name__] = cls
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+def dump_models(value):
+    '''
+    Serializes value - SlottedModel objects, lists, dicts with string keys and plain
+    str / int / float / bool / None values - to JSON (as bytes)
+
+    A model is written as {"$": class name, "#": number, "=": [slot values]} the first
+    time it is seen and as {"@": number} after that, so objects shared between results
+    (e.g. catalog plugins) are still shared once loaded again.
+    '''
+    numbers = {}
+
+    def encode(obj):
+        if not isinstance(obj, SlottedModel):
+            raise TypeError('%s values can not be stored' % type(obj).__name__)
+        number = numbers.get(id(obj))
+        if number is not None:
+            return {'@': number}
+        number = numbers[id(obj)] = len(numbers)
+        return {'$': type(obj).__name__, '#': number, '=': obj.__getstate__()}
+
+    return json.dumps(value, default=encode, separators=(',', ':')).encode('utf-8')
+
+def load_models(data):
+    '''
+    Rebuilds the value stored by dump_models(); only registered SlottedModel classes
+    are ever instantiated, so data from an untrusted source can not run code
+
+    Raises ValueError if data is not valid model JSON
+    '''
+    objects = {}
+
+    def decode(obj):
+        if '$' in obj and len(obj) == 3:
+            cls = SlottedModel._models.get(obj['$'])
+            if cls is None:
+                raise ValueError('unknown model class %r' % obj['$'])
+            model = objects[obj['#']] = cls.__new__(cls)
+            model.__setstate__(obj['='])
+            return model
+        if '@' in obj and len(obj) == 1:
+            return objects[obj['@']]
+        return obj
+
+    try:
+        return json.loads(data, object_hook=decode)
+    except (KeyError, TypeError) as e:
+        raise ValueError('invalid model data: %s' % e)
+
+
+def parallel_map(function, items, workers=1):
+    '''
+    Returns [function(item) for item in items], spread over up to workers processes
+
+    Results come back in input order regardless of which worker finishes first.
+    function must be a module level (picklable) function.
+    '''
+    items = list(items)
+    if not workers or workers < 2 or len(items) < 2:
+        return [function(item) for item in items]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(function, items))
+
+
+# Compiled XSLT stylesheets, keyed by (resolved path, mtime) - see compiled_transform()
+_transforms = {}
+
+def compiled_transform(xsl):
+    '''
+    Returns an etree.XSLT for the stylesheet at path xsl, compiled once per process
+
+    Entries are keyed by resolved path and mtime, so an edited stylesheet is picked up
+    on next use. Each worker process of parallel_map() builds its own copy.
+    '''
+    path = os.path.realpath(xsl)
+    key = (path, os.stat(path).st_mtime)
+    transform = _transforms.get(key)
+    if transform is None:
+        transform = _transforms[key] = etree.XSLT(etree.parse(path))
+    return transform
+
+def ip_sort_key(addr):
+    '''
+    Sort key ordering IPv4 addresses numerically, followed by anything else (hostnames,
+    IPv6) alphabetically
+    '''
+    try:
+        return (0, socket.inet_aton(addr), addr)
+    except (OSError, TypeError):
+        return (1, b'', str(addr))
+
+def model_signature(parser_version, *classes):
+    '''
+    Short fingerprint of a parser version and the given model classes and their slots;
+    cached results from an older parser or model layout are ignored once it changes
+    '''
+    layout = 'v%s;' % parser_version
+    layout += ';'.join('%s:%s' % (cls.__name__, ','.join(cls.__slots__)) for cls in classes)
+    return hashlib.sha1(layout.encode('utf-8')).hexdigest()[:16]
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache(object):
+    '''
+    On-disk cache of parsed results (e.g. the reports from one .nessus file), stored
+    as JSON (see dump_models()) in a SQLite database in the given directory
+
+    Entries are keyed by parser kind and absolute file path and validated against the
+    file size, mtime and a SHA-256 of its content; when size and mtime still match the
+    cached copy is returned without reading the file, and a file which was only touched
+    is recognized by its hash. Once the cache grows beyond max_bytes the least recently
+    used entries are evicted.
+    '''
+    FILENAME = '.parser_cache.sqlite'
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.connection = sqlite3.connect(os.path.join(directory, self.FILENAME))
+        # Hand pages freed by eviction back to the filesystem (only applies to a new database)
+        self.connection.execute("PRAGMA auto_vacuum = FULL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS parse_cache (
+                                       kind TEXT, path TEXT, version TEXT, size INTEGER, mtime REAL, sha256 TEXT,
+                                       data BLOB, bytes INTEGER, last_used REAL,
+                                       PRIMARY KEY (kind, path))""")
+        self.connection.commit()
+
+    def get(self, kind, path, version=''):
+        '''
+        Returns the cached result for path, or None if there is no valid entry
+        '''
+        path = os.path.abspath(path)
+        row = self.connection.execute("""SELECT version, size, mtime, sha256, data FROM parse_cache
+                                         WHERE kind = ? AND path = ?""", (kind, path)).fetchone()
+        if row is None:
+            return None
+
+        (cached_version, size, mtime, sha256, data) = row
+        stat = os.stat(path)
+        if cached_version != version or stat.st_size != size:
+            return None
+
+        if stat.st_mtime != mtime:
+            if file_digest(path) != sha256:
+                return None
+            self.connection.execute("UPDATE parse_cache SET mtime = ? WHERE kind = ? AND path = ?",
+                                    (stat.st_mtime, kind, path))
+
+        try:
+            result = load_models(data)
+        except Exception:
+            # written by an incompatible version of the parser (or damaged) - treat it as
+            # a miss; the entry is replaced once the file has been parsed again
+            self.connection.execute("DELETE FROM parse_cache WHERE kind = ? AND path = ?", (kind, path))
+            self.connection.commit()
+            return None
+
+        self.connection.execute("UPDATE parse_cache SET last_used = ? WHERE kind = ? AND path = ?",
+                                (time.time(), kind, path))
+        self.connection.commit()
+        return result
+
+    def put(self, kind, path, result, version=''):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        data = dump_models(result)
+        if len(data) > self.max_bytes:
+            return
+
+        self.connection.execute("INSERT OR REPLACE INTO parse_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (kind, path, version, stat.st_size, stat.st_mtime, file_digest(path),
+                                 data, len(data), time.time()))
+        self._evict()
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _evict(self):
+        (total,) = self.connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM parse_cache").fetchone()
+        if total <= self.max_bytes:
+            return
+
+        for (kind, path, size) in self.connection.execute("""SELECT kind, path, bytes FROM parse_cache
+                                                            ORDER BY last_used""").fetchall():
+            self.connection.execute("DELETE FROM parse_cache WHERE kind = ? AND path = ?", (kind, path))
+            total -= size
+            if total <= self.max_bytes:
+                break
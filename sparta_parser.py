@@ -14,6 +14,10 @@ import os
 import sqlite3
         
 class SpartaHost(object):
+    __slots__ = ['status', 'addr_ipv4', 'addr_ipv6', 'addr_mac', 'addr_mac_vendor', 'hostnames', 'os_name',
+                 'os_accuracy', 'os_type', 'os_family', 'os_vendor', 'os_gen', 'checked', 'ports', 'host_scripts',
+                 'host_actions']
+
     def __init__(self):
         self.status=''      #up or down
         self.addr_ipv4=''
@@ -33,7 +37,11 @@ class SpartaHost(object):
         self.host_actions=[]
         
 class SpartaPort(object):
+    __slots__ = ['port_id', 'protocol', 'port', 'state', 'svc_name', 'svc_product', 'svc_version', 'svc_extrainfo',
+                 'svc_conf', 'port_scripts', 'port_actions']
+
     def __init__(self):
+        self.port_id=None   #Sparta database key
         self.protocol=''    #tcp, udp
         self.port=0      #port number
         self.state=''       #open, closed, etc
@@ -52,6 +60,8 @@ class SpartaNmapScript(object):
     Host actions will be parsed as sub-objects of a host
     Port actions will be parsed as sub-objects of a port/service
     '''
+    __slots__ = ['script_id', 'script_output']
+
     def __init__(self):
         self.script_id=''
         self.script_output=''
@@ -68,6 +78,8 @@ class SpartaAction(object):
     are also excluded since they are stored only as flat files and we currently have not
     identified an effective way to get that information...SORRY!
     '''
+    __slots__ = ['tool_name', 'tool_command', 'tool_output', 'tool_starttime', 'tool_endtime']
+
     def __init__(self):
         self.tool_name=''
         self.tool_command=''
@@ -102,13 +114,59 @@ class SpartaParser(object):
     
     def _parse_results(self, file_path):
         '''
-        TODO - MODIFY QUERIES TO BRING IN SPARTA ID KEYS AND USE THOSE TO QUERY FOREIGN KEYS
+        Loads each table with a single set based query, groups the rows in Python by host
+        / port and assembles the SpartaHost / SpartaPort objects from the groups (rather
+        than running separate queries for every host and port)
         '''
         
         qry_hosts = """SELECT id, checked, os_match, os_accuracy, ip, ipv4, ipv6, macaddr, status, hostname, vendor,
                             uptime, lastboot, distance, state, count
                         FROM db_tables_nmap_host
                     """
+        
+        # Host level nmap scripts by host id
+        qry_hostscripts="""SELECT db_tables_nmap_host.id, db_tables_nmap_script.script_id, db_tables_nmap_script.output
+                            FROM db_tables_nmap_script
+                            INNER JOIN db_tables_nmap_host ON db_tables_nmap_host.id = db_tables_nmap_script.host_id
+                            WHERE (port_id IS NULL OR port_id = '')
+                            ORDER BY db_tables_nmap_script.rowid"""
+        hostscripts = self._grouped_rows(qry_hostscripts)
+        
+        # Host level actions by host IP
+        qry_hostactions="""SELECT hostip, name, command, output, starttime, endtime
+                            FROM db_tables_process
+                            INNER JOIN db_tables_process_output on db_tables_process.id = db_tables_process_output.process_id
+                            WHERE db_tables_process.name <> 'nmap' AND db_tables_process.pid > 0 AND db_tables_process.status='Finished'
+                                AND (port IS NULL OR port = '') AND hostip IS NOT NULL
+                            ORDER BY db_tables_process.rowid, db_tables_process_output.rowid"""
+        hostactions = self._grouped_rows(qry_hostactions)
+        
+        # Ports / services by host id
+        qry_ports = """SELECT db_tables_nmap_host.id, db_tables_nmap_port.id, db_tables_nmap_host.ip, db_tables_nmap_port.port_id,
+                            db_tables_nmap_port.protocol, db_tables_nmap_port.state, db_tables_nmap_service.name,
+                            db_tables_nmap_service.product, db_tables_nmap_service.version, db_tables_nmap_service.extrainfo
+                        FROM db_tables_nmap_host
+                        INNER JOIN db_tables_nmap_port ON db_tables_nmap_host.id = db_tables_nmap_port.host_id
+                        INNER JOIN db_tables_nmap_service ON db_tables_nmap_port.service_id = db_tables_nmap_service.id
+                        ORDER BY db_tables_nmap_port.rowid"""
+        ports = self._grouped_rows(qry_ports)
+        
+        # Port level nmap scripts by port (database) id
+        qry_portscripts="""SELECT db_tables_nmap_port.id, db_tables_nmap_script.script_id, db_tables_nmap_script.output
+                            FROM db_tables_nmap_script
+                            INNER JOIN db_tables_nmap_port ON db_tables_nmap_port.id = db_tables_nmap_script.port_id
+                            ORDER BY db_tables_nmap_script.rowid"""
+        portscripts = self._grouped_rows(qry_portscripts)
+        
+        # Port level actions by (host IP, port, protocol)
+        qry_portactions="""SELECT hostip, port, protocol, name, command, output, starttime, endtime
+                            FROM db_tables_process
+                            INNER JOIN db_tables_process_output on db_tables_process.id = db_tables_process_output.process_id
+                            WHERE db_tables_process.name <> 'nmap' AND db_tables_process.pid > 0 AND db_tables_process.status='Finished'
+                                AND hostip IS NOT NULL AND port IS NOT NULL AND protocol IS NOT NULL
+                            ORDER BY db_tables_process.rowid, db_tables_process_output.rowid"""
+        portactions = self._grouped_rows(qry_portactions, 3)
+        
         self.cursor.execute(qry_hosts)
         hosts = self.cursor.fetchall()
         for host in hosts:
@@ -126,49 +184,10 @@ class SpartaParser(object):
             sparta_host.os_accuracy=host_os_accuracy
             sparta_host.checked=host_checked
             
-            qry_hostscripts="""SELECT db_tables_nmap_script.script_id, db_tables_nmap_script.output 
-                                FROM db_tables_nmap_script
-                                INNER JOIN db_tables_nmap_host ON db_tables_nmap_host.id = db_tables_nmap_script.host_id
-                                WHERE (port_id IS NULL OR port_id = '') AND db_tables_nmap_host.id = '%s'""" % host_id
-                                
-            self.cursor.execute(qry_hostscripts)
-            hostscripts = self.cursor.fetchall()
-            for hostscript in hostscripts:
-                (script_id, script_output) = hostscript
-                sparta_hostscript=SpartaNmapScript()
-                sparta_hostscript.script_id=script_id
-                sparta_hostscript.script_output=script_output
-                sparta_host.host_scripts.append(sparta_hostscript)
+            sparta_host.host_scripts = _nmap_scripts(hostscripts.get(host_id, []))
+            sparta_host.host_actions = _actions(hostactions.get(str(host_ipv4), []))
             
-            qry_hostactions="""SELECT name, command, output, starttime, endtime
-                                FROM db_tables_process
-                                INNER JOIN db_tables_process_output on db_tables_process.id = db_tables_process_output.process_id
-                                WHERE db_tables_process.name <> 'nmap' AND db_tables_process.pid > 0 AND db_tables_process.status='Finished'
-                                    AND (port IS NULL OR port = '') AND hostip = '%s'""" % host_ipv4
-            
-            self.cursor.execute(qry_hostactions)
-            hostactions = self.cursor.fetchall()
-            for hostaction in hostactions:
-                (action_name, action_command, action_output, action_starttime, action_endtime) = hostaction
-                sparta_hostaction=SpartaAction()
-                sparta_hostaction.tool_name=action_name
-                sparta_hostaction.tool_command=action_command
-                sparta_hostaction.tool_output=action_output
-                sparta_hostaction.tool_starttime=action_starttime
-                sparta_hostaction.tool_endtime=action_endtime
-                sparta_host.host_actions.append(sparta_hostaction)
-            
-            qry_ports = """SELECT db_tables_nmap_port.id, db_tables_nmap_host.ip, db_tables_nmap_port.port_id,
-                                db_tables_nmap_port.protocol, db_tables_nmap_port.state, db_tables_nmap_service.name,
-                                db_tables_nmap_service.product, db_tables_nmap_service.version, db_tables_nmap_service.extrainfo
-                            FROM db_tables_nmap_host
-                            INNER JOIN db_tables_nmap_port ON db_tables_nmap_host.id = db_tables_nmap_port.host_id
-                            INNER JOIN db_tables_nmap_service ON db_tables_nmap_port.service_id = db_tables_nmap_service.id
-                            WHERE db_tables_nmap_host.id = '%s'""" % host_id
-            
-            self.cursor.execute(qry_ports)
-            ports = self.cursor.fetchall()
-            for port in ports:
+            for port in ports.get(host_id, []):
                 (port_id, host_ip, port_port, port_protocol, port_state, port_service_name, port_service_product, port_service_version,
                  port_service_extrainfo) = port
                 
@@ -182,41 +201,48 @@ class SpartaParser(object):
                 sparta_port.svc_version=port_service_version
                 sparta_port.svc_extrainfo=port_service_extrainfo
                 
-                qry_portscripts="""SELECT db_tables_nmap_script.script_id, db_tables_nmap_script.output 
-                                    FROM db_tables_nmap_script
-                                    INNER JOIN db_tables_nmap_port ON db_tables_nmap_port.id = db_tables_nmap_script.port_id
-                                    WHERE db_tables_nmap_port.id = '%s'""" % port_id
-                
-                self.cursor.execute(qry_portscripts)
-                portscripts = self.cursor.fetchall()
-                for portscript in portscripts:
-                    (script_id, script_output) = portscript
-                    sparta_portscript=SpartaNmapScript()
-                    sparta_portscript.script_id=script_id
-                    sparta_portscript.script_output=script_output
-                    sparta_port.port_scripts.append(sparta_portscript)
-                
-                qry_portactions="""SELECT name, command, output, starttime, endtime
-                                    FROM db_tables_process
-                                    INNER JOIN db_tables_process_output on db_tables_process.id = db_tables_process_output.process_id
-                                    WHERE db_tables_process.name <> 'nmap' AND db_tables_process.pid > 0 AND db_tables_process.status='Finished'
-                                        AND hostip = '%s' AND port = '%s' AND protocol = '%s'""" % (host_ipv4, port_port, port_protocol)
-                
-                self.cursor.execute(qry_portactions)
-                portactions = self.cursor.fetchall()
-                for portaction in portactions:
-                    (action_name, action_command, action_output, action_starttime, action_endtime) = portaction
-                    sparta_portaction=SpartaAction()
-                    sparta_portaction.tool_name=action_name
-                    sparta_portaction.tool_command=action_command
-                    sparta_portaction.tool_output=action_output
-                    sparta_portaction.tool_starttime=action_starttime
-                    sparta_portaction.tool_endtime=action_endtime
-                    sparta_port.port_actions.append(sparta_portaction)
+                sparta_port.port_scripts = _nmap_scripts(portscripts.get(port_id, []))
+                sparta_port.port_actions = _actions(portactions.get((str(host_ipv4), str(port_port), str(port_protocol)), []))
                     
                 sparta_host.ports.append(sparta_port)
     
             self.hosts.append(sparta_host)
+
+    def _grouped_rows(self, query, key_columns=1):
+        '''
+        Runs query and returns its rows grouped by the first key_columns columns, as
+        {key: [rest of row, ...]} in query order; multi column keys are compared as text
+        (like the values formatted into the per host / port queries this replaces)
+        '''
+        groups = {}
+        for row in self.cursor.execute(query):
+            if key_columns == 1:
+                key = row[0]
+            else:
+                key = tuple(str(value) for value in row[:key_columns])
+            groups.setdefault(key, []).append(row[key_columns:])
+        return groups
+
+def _nmap_scripts(rows):
+    sparta_scripts = []
+    for (script_id, script_output) in rows:
+        sparta_script=SpartaNmapScript()
+        sparta_script.script_id=script_id
+        sparta_script.script_output=script_output
+        sparta_scripts.append(sparta_script)
+    return sparta_scripts
+
+def _actions(rows):
+    sparta_actions = []
+    for (action_name, action_command, action_output, action_starttime, action_endtime) in rows:
+        sparta_action=SpartaAction()
+        sparta_action.tool_name=action_name
+        sparta_action.tool_command=action_command
+        sparta_action.tool_output=action_output
+        sparta_action.tool_starttime=action_starttime
+        sparta_action.tool_endtime=action_endtime
+        sparta_actions.append(sparta_action)
+    return sparta_actions
     
 def main():
    
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+from lxml import html
+
+from nessus_parser import ReportItemFilter, render_reports, run_transforms
+
+pytest.importorskip('jinja2')
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT = '''<?xml version="1.0" ?>
+<NessusClientData_v2 xmlns:cm="http://www.nessus.org/cm">
+<Report name="test">
+%s
+</Report>
+</NessusClientData_v2>
+'''
+
+HOST = '''<ReportHost name="%s"><HostProperties>
+%s
+</HostProperties>
+%s
+</ReportHost>'''
+
+ITEM = '''<ReportItem port="0" svc_name="general" protocol="tcp" severity="0" pluginID="%s" pluginName="%s" pluginFamily="General">
+<plugin_type>local</plugin_type>
+<description>Description</description>
+<synopsis>Synopsis</synopsis>
+<solution>n/a</solution>
+<risk_factor>None</risk_factor>
+%s
+</ReportItem>'''
+
+def compliance_item(plugin_id, check, result):
+    # result None leaves out cm:compliance-result; '' writes it as an empty element
+    elements = ['<compliance>true</compliance>', '<cm:compliance-check-name>%s</cm:compliance-check-name>' % check,
+                '<cm:compliance-policy-value/>', '<cm:compliance-actual-value>value</cm:compliance-actual-value>']
+    if result is not None:
+        elements.append('<cm:compliance-result>%s</cm:compliance-result>' % result if result else
+                        '<cm:compliance-result/>')
+    return ITEM % (plugin_id, check, '\n'.join(elements))
+
+HOSTS = [
+    ('10.0.0.1', 'one.example', [
+        ITEM % ('66334', 'Patch Report', '<plugin_output/>'),
+        compliance_item('21157', 'empty result', ''),
+        compliance_item('21158', 'failed check', 'FAILED'),
+        compliance_item('21159', 'errored check', 'ERROR'),
+        compliance_item('21160', 'no result', None),
+    ]),
+    ('10.0.0.2', 'two.example', [
+        ITEM % ('66334', 'Patch Report', '<plugin_output>Patch KB1234</plugin_output>'),
+        ITEM % ('66334', 'Patch Report', '<plugin_output>second instance</plugin_output>'),
+        compliance_item('21161', 'passed check', 'PASSED'),
+    ]),
+    ('10.0.0.3', '', [
+        ITEM % ('10287', 'Traceroute Information', '<plugin_output>hops</plugin_output>'),
+    ]),
+]
+
+TRANSFORMS = [
+    ['patch_report', os.path.join(ROOT, 'transforms', 'nessus_patch_status.xslt'),
+     ReportItemFilter(plugin_ids=['66334']), 'nessus_patch_status.html'],
+    ['compliance_report', os.path.join(ROOT, 'transforms', 'nessus_compliance_report.xslt'),
+     ReportItemFilter(elements={'compliance': 'true'}), 'nessus_compliance_report.html'],
+]
+
+
+def text(element):
+    return ' '.join(element.text_content().split())
+
+def patch_rows(path):
+    doc = html.parse(path)
+    return [[text(td) for td in tr.findall('td')] for tr in doc.iter('tr') if tr.findall('td')]
+
+def compliance_rows(path):
+    # [host heading, [row cells], ...] in document order
+    doc = html.parse(path)
+    rows = []
+    for element in doc.iter('h2', 'tr'):
+        if element.tag == 'h2' and not element.xpath('ancestor::*[@id="banner"]'):
+            rows.append(text(element))
+        elif element.tag == 'tr' and element.findall('td'):
+            rows.append([text(td) for td in element.findall('td')])
+    return rows
+
+
+@pytest.fixture
+def rendered(tmp_path):
+    infile = tmp_path / 'scan.nessus'
+    infile.write_text(REPORT % '\n'.join(HOST % (name, '<tag name="host-fqdn">%s</tag>' % fqdn if fqdn else '',
+                                                  '\n'.join(items)) for name, fqdn, items in HOSTS))
+    outdirs = {}
+    for engine in ('xslt', 'native'):
+        outdirs[engine] = tmp_path / engine
+        outdirs[engine].mkdir()
+    run_transforms(str(infile), str(outdirs['xslt']), TRANSFORMS)
+    render_reports(str(infile), str(outdirs['native']), TRANSFORMS)
+    return outdirs
+
+
+def test_patch_report_keeps_empty_plugin_output(rendered):
+    xslt = patch_rows(str(rendered['xslt'] / 'patch_reportscan.html'))
+    native = patch_rows(str(rendered['native'] / 'patch_reportscan.html'))
+    assert xslt == [['10.0.0.1', 'one.example', ''], ['10.0.0.2', 'two.example', 'Patch KB1234']]
+    assert native == xslt
+
+def test_compliance_report_keeps_empty_result(rendered):
+    xslt = compliance_rows(str(rendered['xslt'] / 'compliance_reportscan.html'))
+    native = compliance_rows(str(rendered['native'] / 'compliance_reportscan.html'))
+    assert ['empty result', '', '', 'value'] in xslt
+    assert not any('errored check' in row or 'no result' in row for row in xslt)
+    assert native == xslt
@@ -0,0 +1,82 @@
+import os
+
+import nmap_parser
+from nmap_parser import ParsedOutputState
+
+
+SCAN = '''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE nmaprun>
+<nmaprun scanner="nmap" args="nmap -sV -oX scan.xml" start="1" startstr="Mon" version="7.80" xmloutputversion="1.04">
+<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>
+<verbose level="0"/>
+<debugging level="0"/>
+%s
+<runstats><finished time="2" timestr="Mon" elapsed="1" exit="success"/><hosts up="1" down="0" total="1"/></runstats>
+</nmaprun>
+'''
+
+HOST = '''<host starttime="1" endtime="2"><status state="up" reason="echo-reply" reason_ttl="63"/>
+<address addr="%s" addrtype="ipv4"/>
+<hostnames></hostnames>
+<ports>
+<port protocol="tcp" portid="%s"><state state="open" reason="syn-ack" reason_ttl="63"/><service name="%s" method="probed" conf="10"/></port>
+</ports>
+</host>'''
+
+
+def write_scan(path, hosts):
+    with open(path, 'w') as f:
+        f.write(SCAN % '\n'.join(HOST % host for host in hosts))
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_truncated_scan_is_skipped_and_retried(tmp_path):
+    scans = tmp_path / 'scans'
+    scans.mkdir()
+    write_scan(str(scans / 'a.xml'), [('10.0.0.1', '22', 'ssh')])
+
+    # b.xml is still being written by nmap - cut it off part way through a host
+    write_scan(str(scans / 'b.xml'), [('10.0.0.2', '80', 'http')])
+    with open(str(scans / 'b.xml')) as f:
+        complete = f.read()
+    with open(str(scans / 'b.xml'), 'w') as f:
+        f.write(complete[:complete.index('<ports>')])
+
+    state = ParsedOutputState(str(tmp_path))
+    assert state.update(str(scans)) == 1
+    assert read_lines(str(tmp_path / 'parsed' / 'hosts.txt')) == ['10.0.0.1']
+    assert str(scans / 'b.xml') not in state.files
+
+    # the saved state does not contain the partial file either
+    assert str(scans / 'b.xml') not in ParsedOutputState(str(tmp_path)).files
+
+    # once nmap has finished the file is picked up on the next pass
+    with open(str(scans / 'b.xml'), 'w') as f:
+        f.write(complete)
+    os.utime(str(scans / 'b.xml'), (1, 1))
+
+    state = ParsedOutputState(str(tmp_path))
+    assert state.update(str(scans)) == 1
+    assert read_lines(str(tmp_path / 'parsed' / 'hosts.txt')) == ['10.0.0.1', '10.0.0.2']
+    assert read_lines(str(tmp_path / 'parsed' / 'services' / 'http-80-tcp.txt')) == ['10.0.0.2']
+
+
+def test_watch_survives_truncated_scan(tmp_path, monkeypatch):
+    scans = tmp_path / 'scans'
+    scans.mkdir()
+    with open(str(scans / 'partial.xml'), 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<nmaprun scanner="nmap"><host>')
+
+    passes = []
+    def sleep(interval):
+        passes.append(interval)
+        if len(passes) == 2:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(nmap_parser.time, 'sleep', sleep)
+
+    nmap_parser.watch_parsed_output(str(scans), str(tmp_path), interval=5)
+    assert passes == [5, 5]
+    assert read_lines(str(tmp_path / 'parsed' / 'hosts.txt')) == []
@@ -0,0 +1,127 @@
+import os
+
+from nmap_parser import PARSER_VERSION, NmapPort
+from parser_utils import ParseCache, model_signature
+
+VERSION = model_signature(PARSER_VERSION, NmapPort)
+
+
+def write(path, content, mtime=None):
+    with open(path, 'w') as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+def port(portid):
+    result = NmapPort()
+    result.portid = portid
+    return result
+
+def rows(cache):
+    return [path for (path,) in cache.connection.execute('SELECT path FROM parse_cache ORDER BY path')]
+
+
+def test_hit_on_unchanged_file(tmp_path):
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        assert cache.get('nmap', scan, VERSION) is None
+        cache.put('nmap', scan, [port('22'), {'hosts': 1}], VERSION)
+        result = cache.get('nmap', scan, VERSION)
+
+    assert isinstance(result[0], NmapPort) and result[0].portid == '22'
+    assert result[1] == {'hosts': 1}
+
+def test_hit_survives_reopening(tmp_path):
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        cache.put('nmap', scan, ['result'], VERSION)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        assert cache.get('nmap', scan, VERSION) == ['result']
+
+def test_miss_after_content_changes(tmp_path):
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        cache.put('nmap', scan, ['result'], VERSION)
+        # same size, new content
+        write(scan, 'scan two', mtime=2000)
+        assert cache.get('nmap', scan, VERSION) is None
+        # different size
+        write(scan, 'scan three', mtime=2000)
+        assert cache.get('nmap', scan, VERSION) is None
+
+def test_hit_after_touch(tmp_path):
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        cache.put('nmap', scan, ['result'], VERSION)
+        os.utime(scan, (2000, 2000))
+        assert cache.get('nmap', scan, VERSION) == ['result']
+        # the new mtime is recorded, so the next lookup does not hash the file again
+        (mtime,) = cache.connection.execute('SELECT mtime FROM parse_cache').fetchone()
+        assert mtime == 2000
+
+def test_miss_after_parser_version_changes(tmp_path):
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        cache.put('nmap', scan, ['result'], VERSION)
+        assert cache.get('nmap', scan, model_signature(PARSER_VERSION + 1, NmapPort)) is None
+        assert cache.get('nmap', scan, VERSION) == ['result']
+
+def test_miss_after_model_signature_changes(tmp_path):
+    class Model(object):
+        __slots__ = ['portid']
+
+    class ChangedModel(object):
+        __slots__ = ['portid', 'protocol']
+    ChangedModel.__name__ = 'Model'
+
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        cache.put('nmap', scan, ['result'], model_signature(PARSER_VERSION, Model))
+        assert cache.get('nmap', scan, model_signature(PARSER_VERSION, ChangedModel)) is None
+
+def test_corrupt_row_is_ignored(tmp_path):
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache')) as cache:
+        cache.put('nmap', scan, ['result'], VERSION)
+        for data in (b'{"$": "NoSuchModel", "#": 0, "=": []}', b'not json'):
+            cache.connection.execute('UPDATE parse_cache SET data = ?', (data,))
+            cache.connection.commit()
+            assert cache.get('nmap', scan, VERSION) is None
+            # the damaged entry is dropped, and a fresh put replaces it
+            assert rows(cache) == []
+            cache.put('nmap', scan, ['result'], VERSION)
+
+        assert cache.get('nmap', scan, VERSION) == ['result']
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    paths = [str(tmp_path / name) for name in ('a.xml', 'b.xml', 'c.xml')]
+    for path in paths:
+        write(path, path, mtime=1000)
+
+    result = ['x' * 100]
+    with ParseCache(str(tmp_path / 'cache'), max_bytes=250) as cache:
+        cache.put('nmap', paths[0], result, VERSION)
+        cache.put('nmap', paths[1], result, VERSION)
+        # a.xml is used more recently than b.xml
+        cache.connection.execute('UPDATE parse_cache SET last_used = 1 WHERE path = ?', (paths[1],))
+        cache.connection.execute('UPDATE parse_cache SET last_used = 2 WHERE path = ?', (paths[0],))
+        cache.connection.commit()
+
+        cache.put('nmap', paths[2], result, VERSION)
+        assert rows(cache) == [paths[0], paths[2]]
+        assert cache.get('nmap', paths[1], VERSION) is None
+        assert cache.get('nmap', paths[0], VERSION) == result
+
+def test_result_larger_than_cache_is_not_stored(tmp_path):
+    scan = str(tmp_path / 'scan.xml')
+    write(scan, 'scan one', mtime=1000)
+    with ParseCache(str(tmp_path / 'cache'), max_bytes=50) as cache:
+        cache.put('nmap', scan, ['x' * 100], VERSION)
+        assert rows(cache) == []
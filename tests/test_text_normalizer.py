@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from text_normalizer import (TextNormalizer, normalize_name, normalize_paragraph, normalize_solution,
+                             normalize_synopsis)
+
+
+# The cleanup chains exactly as NessusParser / OpenvasParser applied them before
+# text_normalizer.py existed
+def legacy_name(text):
+    text = text.replace(")-", ") - ")
+    text = text.replace("s(", "s (")
+    text = text.replace("e(", "e (")
+    return text
+
+def legacy_synopsis(text):
+    return text.replace("\n  ", " ")
+
+def legacy_paragraph(text):
+    text = text.replace("\n  -", "\n•")
+    text = text.replace("\n -", "\n•")
+    text = text.replace("\n\n  ", "\n\n")
+    text = text.replace("\n\n ", "\n\n")
+    text = text.replace("     ", " ")
+    text = text.replace("\n    ", " ")
+    text = text.replace("\n   ", " ")
+    text = text.replace("\n  ", " ")
+    text = text.replace("\n ", " ")
+    return text
+
+def legacy_solution(text):
+    text = text.replace("\n  -", "\n•")
+    text = text.replace("\n -", "\n•")
+    text = text.replace("\n  ", " ")
+    text = text.replace("\n ", " ")
+    return text
+
+NORMALIZERS = [(normalize_name, legacy_name), (normalize_synopsis, legacy_synopsis),
+               (normalize_paragraph, legacy_paragraph), (normalize_solution, legacy_solution)]
+
+
+CORPUS = [
+    '',
+    ' ',
+    '\n',
+    'plain text with no cleanup to do',
+    # plugin names
+    'MS12-020: Vulnerabilities in Remote Desktop Could Allow Remote Code Execution (2671387)-(uncredentialed check)',
+    'Apache Multiple Vulnerabilities(CVE-2017-3167)',
+    'Service(s) Detection(TCP)-Banner',
+    'e(s(e()-)-s(',
+    # typical Nessus description / solution layout
+    'The remote host is affected by:\n\n  - CVE-2019-0001\n  - CVE-2019-0002\n\nUpgrade to version 1.2.3 or later.',
+    'Upgrade to the latest version.\n  - Apply patch 1\n - Apply patch 2\n   or remove\n    the software.',
+    'Synopsis line one\n  continued on line two\n  and three.',
+    # runs of spaces
+    'word     word',
+    'word          word',
+    'word      word',
+    'a    b   c  d e',
+    '     leading five spaces',
+    'trailing five spaces     ',
+    # leading / trailing whitespace
+    '\n  leading newline indent',
+    '  \n  leading spaces and newline',
+    'trailing newline indent\n  ',
+    'trailing newline\n',
+    '\n\n\n',
+    '\n\n  \n\n ',
+    # CRLF line endings
+    'line one\r\n  line two\r\n  - bullet\r\n\r\n  paragraph',
+    'line one\r\n line two\r\n\r\n',
+    '\r\n     \r\n',
+    # tabs
+    'line one\n\tline two\n\t- bullet',
+    'tab\t\tseparated\n \tmixed\n\t \n  \t-',
+    # bullets and paragraph breaks next to each other
+    '\n  -\n -\n\n  -\n\n -',
+    'x\n\n    -y',
+    'x\n     -y\n      -z',
+    'a\n-b\n --c\n  ---d',
+    # non-ASCII text
+    'Résumé\n  – naïve\n  - café     ünïcödé',
+]
+
+
+@pytest.mark.parametrize('normalize, legacy', NORMALIZERS, ids=lambda f: f.__name__)
+@pytest.mark.parametrize('text', CORPUS)
+def test_matches_legacy_chain(normalize, legacy, text):
+    assert normalize(text) == legacy(text)
+
+
+@pytest.mark.parametrize('normalize, legacy', NORMALIZERS, ids=lambda f: f.__name__)
+def test_matches_legacy_chain_on_generated_text(normalize, legacy):
+    # random mixes of the characters the chains care about, from a fixed seed
+    rng = random.Random(3)
+    alphabet = ['\n', ' ', ' ', ' ', '-', '\r', '\t', 'a', 'e', 's', '(', ')', '•']
+    for _ in range(5000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert normalize(text) == legacy(text), repr(text)
+
+
+def test_cache_returns_normalized_text():
+    normalizer = TextNormalizer()
+    text = 'Upgrade\n  - now'
+    assert normalizer.normalize(normalize_solution, text, '10001') == legacy_solution(text)
+    assert normalizer.normalize(normalize_solution, text, '10001') == legacy_solution(text)
+
+def test_cache_checks_raw_text():
+    # the same plugin ID with different text must not be served the cached result
+    normalizer = TextNormalizer()
+    first = 'first\n  - item'
+    second = 'second\n -  item'
+    assert normalizer.normalize(normalize_paragraph, first, '10001') == legacy_paragraph(first)
+    assert normalizer.normalize(normalize_paragraph, second, '10001') == legacy_paragraph(second)
+
+def test_cache_disabled():
+    normalizer = TextNormalizer(cache=False)
+    assert normalizer.normalize(normalize_name, 'Service(s)-x', '10001') == legacy_name('Service(s)-x')
+    assert not normalizer._cache
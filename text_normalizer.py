@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+IS Audits & Consulting, LLC
+TJS Deemer Dana LLP
+
+Shared cleanup of the screwball formatting found in Nessus / OpenVAS finding text
+(plugin names, descriptions, solutions, etc)
+
+Each cleanup is defined as the chain of str.replace() calls the parsers have always
+used. Every pattern in the whitespace chains is made up of newlines and spaces
+(optionally ending in a single "-"), so a replacement can never reach past a run of
+whitespace; instead of rewriting the whole field once per pattern, a single compiled
+regex pass picks out the whitespace runs that could change and the replace chain is
+applied to each run alone (memoized, since the same few runs repeat everywhere).
+
+See README.md for licensing information and credits
+
+'''
+import re
+from functools import lru_cache
+
+# Replacement chains - applied in order, same semantics as chained str.replace()
+NAME_REPLACEMENTS = [(")-", ") - "), ("s(", "s ("), ("e(", "e (")]
+
+PARAGRAPH_REPLACEMENTS = [("\n  -", "\n•"), ("\n -", "\n•"), ("\n\n  ", "\n\n"), ("\n\n ", "\n\n"), ("     ", " "),
+                          ("\n    ", " "), ("\n   ", " "), ("\n  ", " "), ("\n ", " ")]
+
+SOLUTION_REPLACEMENTS = [("\n  -", "\n•"), ("\n -", "\n•"), ("\n  ", " "), ("\n ", " ")]
+
+SYNOPSIS_REPLACEMENTS = [("\n  ", " ")]
+
+# Runs of newlines / spaces (plus a trailing "-") which start with a newline or 5 spaces
+# (fewer than 5 spaces ahead of a newline are never touched by any of the patterns);
+# anything else is left untouched by the whitespace chains above
+_WHITESPACE_RUN = re.compile(r'((?:\n|     )[\n ]*-?)')
+
+# The name chain patterns never overlap or feed each other, so one alternation will do
+_NAME_PATTERN = re.compile('|'.join(re.escape(old) for old, new in NAME_REPLACEMENTS))
+_NAME_LOOKUP = dict(NAME_REPLACEMENTS)
+
+
+def replace_chain(text, replacements):
+    '''
+    Reference implementation - applies each (old, new) replacement in turn
+    '''
+    for old, new in replacements:
+        text = text.replace(old, new)
+    return text
+
+def _whitespace_normalizer(replacements):
+    @lru_cache(maxsize=4096)
+    def normalize_run(run):
+        return replace_chain(run, replacements)
+
+    def normalize(text):
+        if '\n' not in text and '     ' not in text:
+            return text
+
+        # split() leaves the matched runs at the odd indexes
+        parts = _WHITESPACE_RUN.split(text)
+        for i in range(1, len(parts), 2):
+            parts[i] = normalize_run(parts[i])
+        return ''.join(parts)
+
+    return normalize
+
+normalize_paragraph = _whitespace_normalizer(PARAGRAPH_REPLACEMENTS)
+normalize_solution = _whitespace_normalizer(SOLUTION_REPLACEMENTS)
+
+def normalize_synopsis(text):
+    # single replacement - str.replace is already one pass
+    return replace_chain(text, SYNOPSIS_REPLACEMENTS)
+
+def normalize_name(text):
+    return _NAME_PATTERN.sub(lambda match: _NAME_LOOKUP[match.group()], text)
+
+
+class TextNormalizer(object):
+    '''
+    Applies the normalize_* functions to finding text, optionally memoizing the result
+    per field and plugin ID / NVT OID - the same plugin's description text repeats
+    across every host it fires on, so most lookups never touch the regex at all.
+
+    The raw text is kept with each cached entry and compared on lookup, so a plugin
+    whose text differs between hosts is still normalized correctly.
+    '''
+    def __init__(self, cache=True):
+        self.cache = cache
+        self._cache = {}
+
+    def normalize(self, function, text, key=None):
+        if not self.cache or key is None:
+            return function(text)
+
+        cache_key = (function, key)
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[0] == text:
+            return cached[1]
+
+        normalized = function(text)
+        self._cache[cache_key] = (text, normalized)
+        return normalized